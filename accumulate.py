@@ -0,0 +1,264 @@
+"""
+This module implements carry-save accumulation of
+many shifted numbers, with a single vectorized pass
+to resolve the carries at the end.
+
+util.add carries after every column, and a carry can
+ripple arbitrarily far to the left, so adding k
+numbers is a serial O(n*k) walk. Here the numbers
+are simply summed into the columns of a NumPy array
+without normalizing, and the carries are resolved
+once at the end, in two steps:
+
+1) a few rounds of divmod push the excess of every
+   column into its neighbour, all columns at once,
+   until every column is at most 18;
+2) a carry-lookahead pass settles the remaining
+   carries of 0 or 1. A column of 10 or more always
+   generates a carry, a column of exactly 9 passes
+   on whatever carry it receives, and any other
+   column stops it. So the carry into a column is
+   decided by the nearest column to its right that
+   isn't a 9, which is found for every column at
+   once with a parallel prefix (running maximum).
+
+Internally the columns are stored least significant
+first, so that a column's index is its cardinality.
+"""
+
+import numpy as np
+
+from util import add, pad, split, subtract, strip_leading_zeros
+from grade_school import multiply_simple
+
+# an int64 column holds at most 19 digits, so this much headroom
+# above the top column is always enough for the final carries
+HEADROOM = 20
+# below this many digits, setting up the NumPy columns costs more
+# than util.add carrying as it goes (measured at 16 to 32 digits)
+CARRY_SAVE_THRESHOLD = 32
+
+
+class CarrySaveAccumulator:
+    """
+    Sums non-negative numbers represented as arrays,
+    each shifted left by some number of digits, without
+    carrying until the result is asked for.
+    """
+    __slots__ = ('columns', )
+
+    def __init__(self, length=0):
+        """
+        :param length: int, the expected number of digits in the result
+        """
+        self.columns = np.zeros(length + HEADROOM, dtype=np.int64)
+
+    def add(self, num, shift=0):
+        """
+        Adds num * 10^shift into the columns.
+
+        :param num: []int
+        :param shift: int
+        """
+        end = shift + len(num)
+        if end + HEADROOM > len(self.columns):
+            columns = np.zeros(end + HEADROOM, dtype=np.int64)
+            columns[:len(self.columns)] = self.columns
+            self.columns = columns
+        self.columns[shift:end] += np.asarray(num[::-1], dtype=np.int64)
+
+    def result(self):
+        """
+        Resolves the carries and returns the sum.
+
+        :rtype []int
+        """
+        return normalize(self.columns)
+
+
+def normalize(columns):
+    """
+    Resolves the carries in an array of non-negative
+    column sums, least significant first, returning the
+    number they add up to represented as an array. The
+    top HEADROOM columns must be zero to leave room for
+    the carries.
+
+    :param columns: np.ndarray
+    :rtype []int
+    """
+    columns = np.array(columns, dtype=np.int64)
+    if len(columns) and columns.min() < 0:
+        raise ValueError('normalize only handles non-negative columns')
+
+    # push the excess of every column into its neighbour
+    # until no column can generate a carry of more than one
+    while len(columns) and columns.max() > 18:
+        carries, columns = np.divmod(columns, 10)
+        columns[1:] += carries[:-1]
+
+    # carry-lookahead: find the nearest column to the right
+    # of each column that isn't a 9, and whether it generates
+    generate = columns >= 10
+    propagate = columns == 9
+    positions = np.arange(len(columns))
+    nearest = np.maximum.accumulate(np.where(propagate, -1, positions))
+    carry_in = np.zeros(len(columns), dtype=np.int64)
+    if len(columns) > 1:
+        source = nearest[:-1]
+        carry_in[1:] = np.where(source >= 0, generate[np.maximum(source, 0)],
+                                0)
+
+    digits = (columns + carry_in) % 10
+    return strip_leading_zeros(digits[::-1].tolist())
+
+
+def add_shifted(*parts):
+    """
+    Adds an arbitrary number of (num, shift) pairs,
+    where each num is represented as an array and is
+    shifted left by `shift` digits, i.e. padded on the
+    right with that many zeros.
+
+    :param parts: *([]int, int)
+    :rtype []int
+    """
+    accumulator = CarrySaveAccumulator(
+        max((len(num) + shift for num, shift in parts), default=0))
+    for num, shift in parts:
+        accumulator.add(num, shift)
+    return accumulator.result()
+
+
+def multiply_rows(x, y):
+    """
+    Multiplies two numbers represented as arrays with
+    the grade school algorithm as it's done on paper:
+    one row per digit of y, each row x times that digit
+    shifted into place, and the rows summed. The rows
+    are summed in a carry-save accumulator, so nothing
+    is carried until the very end.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    accumulator = CarrySaveAccumulator(len(x) + len(y))
+    for shift, digit in enumerate(reversed(y)):
+        if digit:
+            accumulator.add([digit * d for d in x], shift)
+    return accumulator.result()
+
+
+def multiply_karatsuba_carry_save(x, y, threshold=1, base=multiply_simple):
+    """
+    Multiplies two numbers represented as arrays using
+    the Karatsuba algorithm, combining the sub-products
+    at each level with add_shifted instead of util.add.
+    Levels below CARRY_SAVE_THRESHOLD digits, where the
+    NumPy overhead outweighs the saving, use util.add.
+
+    :param x: []int
+    :param y: []int
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype []int
+    """
+    length = max(len(x), len(y))
+    if length <= threshold:
+        return base(x, y)
+    x = [0] * (length - len(x)) + x
+    y = [0] * (length - len(y)) + y
+    a, b = split(x)
+    c, d = split(y)
+    shift = len(b)
+
+    if length < CARRY_SAVE_THRESHOLD:
+        res_1 = multiply_karatsuba_carry_save(a, c, threshold, base)
+        res_2 = multiply_karatsuba_carry_save(b, d, threshold, base)
+        partial = multiply_karatsuba_carry_save(add(a, b), add(c, d),
+                                                threshold, base)
+        res_3 = subtract(partial, add(res_1, res_2))
+        return strip_leading_zeros(
+            add(pad(res_1, 2 * shift, 'right'), res_2,
+                pad(res_3, shift, 'right')))
+
+    res_1 = multiply_karatsuba_carry_save(a, c, threshold, base)
+    res_2 = multiply_karatsuba_carry_save(b, d, threshold, base)
+    partial = multiply_karatsuba_carry_save(
+        add_shifted((a, 0), (b, 0)), add_shifted((c, 0), (d, 0)), threshold,
+        base)
+    res_3 = subtract(partial, add_shifted((res_1, 0), (res_2, 0)))
+
+    return add_shifted((res_1, 2 * shift), (res_2, 0), (res_3, shift))
+
+if __name__ == '__main__':
+    import random
+    from util import add, pad
+    from convolution import multiply_convolution
+    from big_numbers import big_number_as_array
+
+    print('testing normalize')
+    assert normalize(np.zeros(0, dtype=np.int64)) == [0]
+    assert normalize([3, 2, 1] + [0] * HEADROOM) == [1, 2, 3]
+    assert normalize([10] + [0] * HEADROOM) == [1, 0]
+    assert normalize([10, 9, 9, 9] + [0] * HEADROOM) == [1, 0, 0, 0, 0]
+    assert normalize([19, 9, 8, 9] + [0] * HEADROOM) == [9, 9, 0, 9]
+    assert normalize([12345, 0, 0] + [0] * HEADROOM) == [1, 2, 3, 4, 5]
+
+    print('testing add_shifted')
+    assert add_shifted(([0], 0)) == [0]
+    assert add_shifted(([8, 4], 0), ([3, 5], 0)) == [1, 1, 9]
+    assert add_shifted(([2, 4, 5], 0), ([0, 6, 7], 0),
+                       ([0, 0, 5], 0)) == [3, 1, 7]
+    assert add_shifted(([6], 2), ([9, 9], 0)) == [6, 9, 9]
+    parts = [([random.randint(0, 9) for _ in range(random.randint(1, 80))],
+              random.randint(0, 40)) for _ in range(50)]
+    assert add_shifted(*parts) == strip_leading_zeros(
+        add(*[pad(num, shift, 'right') for num, shift in parts]))
+
+    print('testing multiply_rows')
+    assert multiply_rows([0], [0]) == [0]
+    assert multiply_rows([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_rows(big_number_as_array,
+                         big_number_as_array) == multiply_convolution(
+                             big_number_as_array, big_number_as_array)
+
+    print('testing multiply_karatsuba_carry_save')
+    assert multiply_karatsuba_carry_save([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_karatsuba_carry_save(
+        big_number_as_array, big_number_as_array, 64,
+        multiply_convolution) == multiply_convolution(big_number_as_array,
+                                                      big_number_as_array)
+    # both sides of CARRY_SAVE_THRESHOLD, with uneven lengths
+    for _ in range(10):
+        x = [random.randint(0, 9) for _ in range(random.randint(1, 100))]
+        y = [random.randint(0, 9) for _ in range(random.randint(1, 100))]
+        assert multiply_karatsuba_carry_save(x, y) == multiply_convolution(
+            x, y)
+
+    import time
+    from karatsuba import multiply_karatsuba
+    start = time.time()
+    add_shifted(*parts * 20)
+    end = time.time()
+    print('add_shifted', (end - start) * 1000, 'milliseconds')
+    padded = [pad(num, shift, 'right') for num, shift in parts * 20]
+    start = time.time()
+    add(*padded)
+    end = time.time()
+    print('add', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    multiply_rows(big_number_as_array, big_number_as_array)
+    end = time.time()
+    print('multiply_rows', (end - start) * 1000, 'milliseconds')
+    x = big_number_as_array[:600]
+    start = time.time()
+    multiply_karatsuba_carry_save(x, x[::-1])
+    end = time.time()
+    print('multiply_karatsuba_carry_save', (end - start) * 1000,
+          'milliseconds')
+    start = time.time()
+    multiply_karatsuba(x, x[::-1])
+    end = time.time()
+    print('multiply_karatsuba', (end - start) * 1000, 'milliseconds')
@@ -0,0 +1,179 @@
+"""
+This module implements multiplication of many
+independent pairs of numbers at once. The pairs
+are grouped into batches, so that lots of small
+products share the cost of a single task, and the
+batches are run on the shared worker pool. Results
+are yielded as a stream, and only a bounded number
+of batches are ever in flight, so memory stays flat
+even when the input never ends.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+import itertools
+
+from dispatcher import multiply, multiply_serial
+from pool import default_workers, get_pool
+
+# a batch is closed once it holds this many pairs...
+BATCH_SIZE = 64
+# ...or this many digits, whichever comes first
+BATCH_DIGITS = 100000
+
+
+def multiply_many(pairs,
+                  ordered=True,
+                  engine=multiply_serial,
+                  workers=None,
+                  batch_size=BATCH_SIZE,
+                  batch_digits=BATCH_DIGITS,
+                  max_in_flight=None):
+    """
+    Multiplies every (x, y) pair from an iterable of pairs
+    of numbers represented as arrays. If `ordered`, the
+    products are yielded in the same order as the pairs;
+    otherwise (index, product) tuples are yielded as soon
+    as each batch finishes, where index is the position of
+    the pair in the input. At most `max_in_flight` batches
+    are submitted but not yet yielded at any one time.
+    `engine` runs inside the pool workers, so it must not
+    use the pool itself.
+
+    :param pairs: iterable of ([]int, []int)
+    :param ordered: bool
+    :param engine: func([]int, []int) []int
+    :param workers: int
+    :param batch_size: int
+    :param batch_digits: int
+    :param max_in_flight: int
+    :rtype generator of []int or (int, []int)
+    """
+    if workers is None:
+        workers = default_workers()
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    pool = get_pool(workers)
+    batches = _batches(pairs, batch_size, batch_digits)
+
+    if ordered:
+        in_flight = deque()
+        for _, batch in batches:
+            in_flight.append(pool.submit(_multiply_batch, engine, batch))
+            # wait on the oldest batch before taking on any more
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+        return
+
+    in_flight = {}
+    for start, batch in batches:
+        future = pool.submit(_multiply_batch, engine, batch)
+        in_flight[future] = start
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from _drain(done, in_flight)
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        yield from _drain(done, in_flight)
+
+
+def _batches(pairs, batch_size, batch_digits):
+    """
+    Groups pairs into batches, yielding (start, batch) where
+    start is the index of the first pair in the batch.
+
+    :param pairs: iterable of ([]int, []int)
+    :param batch_size: int
+    :param batch_digits: int
+    :rtype generator of (int, [([]int, []int)])
+    """
+    batch = []
+    digits = 0
+    start = 0
+    for index, (x, y) in zip(itertools.count(), pairs):
+        batch.append((x, y))
+        digits += len(x) + len(y)
+        if len(batch) >= batch_size or digits >= batch_digits:
+            yield start, batch
+            batch = []
+            digits = 0
+            start = index + 1
+    if batch:
+        yield start, batch
+
+
+def _drain(done, in_flight):
+    """
+    Yields (index, product) for every pair in the finished
+    batches, removing them from the in flight batches.
+
+    :param done: set of Future
+    :param in_flight: {Future: int}
+    :rtype generator of (int, []int)
+    """
+    for future in done:
+        start = in_flight.pop(future)
+        for offset, product in enumerate(future.result()):
+            yield start + offset, product
+
+
+def _multiply_batch(engine, batch):
+    """
+    Runs in a worker: multiplies every pair in a batch.
+
+    :param engine: func([]int, []int) []int
+    :param batch: [([]int, []int)]
+    :rtype [][]int
+    """
+    return [engine(x, y) for x, y in batch]
+
+
+if __name__ == '__main__':
+    import random
+    from convolution import multiply_convolution
+
+    print('testing multiply_many')
+    assert list(multiply_many([])) == []
+    assert list(multiply_many([([2, 4, 5], [6, 7]), ([2], [3])])) == [
+        [1, 6, 4, 1, 5], [6]]
+    # an unbalanced pair, which the dispatcher would split on the pool
+    assert list(multiply_many([([2, 5], [1, 0, 0, 0, 0, 1])],
+                              workers=4)) == [[2, 5, 0, 0, 0, 2, 5]]
+
+    pairs = [([random.randint(0, 9) for _ in range(random.randint(1, 60))],
+              [random.randint(0, 9) for _ in range(random.randint(1, 60))])
+             for _ in range(1000)]
+    expected = [multiply_convolution(x, y) for x, y in pairs]
+    assert list(multiply_many(pairs, batch_size=7,
+                              max_in_flight=3)) == expected
+    unordered = dict(multiply_many(iter(pairs), ordered=False, batch_size=7))
+    assert [unordered[i] for i in range(len(pairs))] == expected
+
+    # only as much of an endless input is read as the in flight limit allows
+    endless = (([2], [3]) for _ in itertools.count())
+    products = multiply_many(endless, batch_size=10, max_in_flight=2)
+    assert list(itertools.islice(products, 25)) == [[6]] * 25
+
+    # another pool being asked for mid-stream doesn't pull the pool
+    # out from under the generator
+    from parallel_karatsuba import multiply_karatsuba_parallel
+    products = multiply_many(pairs, workers=2, batch_size=1)
+    assert list(itertools.islice(products, 5)) == expected[:5]
+    x = [random.randint(1, 9) for _ in range(400)]
+    assert multiply_karatsuba_parallel(
+        x, x[::-1], workers=3) == multiply_convolution(x, x[::-1])
+    assert list(products) == expected[5:]
+
+    import time
+    start = time.time()
+    for _ in multiply_many(pairs):
+        pass
+    end = time.time()
+    print('multiply_many', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    for x, y in pairs:
+        multiply(x, y)
+    end = time.time()
+    print('multiply one by one', (end - start) * 1000, 'milliseconds')
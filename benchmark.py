@@ -0,0 +1,260 @@
+"""
+This module implements a benchmark harness for the
+multiplication algorithms. It sweeps over operand
+sizes, skewed operand lengths and worker counts,
+times each multiplication repeatedly after a warm-up,
+and records the throughput and peak memory. Every
+result is checked against Python's own int
+multiplication, so an algorithm that is fast but
+wrong gets flagged. It also records how long the
+engines take to import and how many worker processes
+are alive after each case.
+
+Results are printed and can be saved as JSON, and a
+later run can be compared against a saved baseline:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from convert import digits_to_int, int_to_digits
+from dispatcher import ENGINES, PARALLEL_ENGINES
+from pool import default_workers
+from util import strip_leading_zeros
+
+DEFAULT_ENGINES = ['simple', 'karatsuba', 'karatsuba_parallel']
+DEFAULT_SIZES = [100, 300, 1000]
+IMPORT_MODULES = ['dispatcher', 'karatsuba', 'parallel_karatsuba']
+
+
+def random_number(length, rng):
+    """
+    Generates a random number of exactly `length` digits.
+
+    :param length: int
+    :param rng: random.Random
+    :rtype []int
+    """
+    return [rng.randint(1, 9)] + [rng.randint(0, 9) for _ in range(length - 1)]
+
+
+def benchmark_case(engine, x, y, workers=None, repeats=5, warmup=1):
+    """
+    Times one engine multiplying x by y, returning
+    a dict describing the result.
+
+    :param engine: str
+    :param x: []int
+    :param y: []int
+    :param workers: int
+    :param repeats: int
+    :param warmup: int
+    :rtype dict
+    """
+    func = ENGINES[engine]
+    if engine in PARALLEL_ENGINES:
+        func = functools.partial(func, workers=workers)
+
+    for _ in range(warmup):
+        res = func(x, y)
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        res = func(x, y)
+        times.append(time.perf_counter() - start)
+
+    # measure memory on a separate run, since tracing slows things down
+    tracemalloc.start()
+    func(x, y)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        'engine': engine,
+        'x_digits': len(x),
+        'y_digits': len(y),
+        'workers': workers,
+        'times': times,
+        'median': median,
+        'min': min(times),
+        'digits_per_second': (len(x) + len(y)) / median if median else None,
+        'peak_memory': peak_memory,
+        'correct': strip_leading_zeros(res) == int_to_digits(
+            digits_to_int(x) * digits_to_int(y)),
+        'child_processes': len(multiprocessing.active_children()),
+    }
+
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter, returning
+    how long the import took and how many child processes
+    were running once it was done.
+
+    :param module: str
+    :rtype dict
+    """
+    code = ('import time\n'
+            'start = time.perf_counter()\n'
+            'import {}\n'
+            'elapsed = time.perf_counter() - start\n'
+            'import multiprocessing\n'
+            'print(elapsed, len(multiprocessing.active_children()))')
+    output = subprocess.check_output(
+        [sys.executable, '-c', code.format(module)],
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, children = output.split()
+    return {
+        'module': module,
+        'seconds': float(seconds),
+        'child_processes': int(children)
+    }
+
+
+def run(engines=DEFAULT_ENGINES,
+        sizes=DEFAULT_SIZES,
+        skews=(1, ),
+        workers=None,
+        repeats=5,
+        warmup=1,
+        seed=0):
+    """
+    Runs every combination of engine, size, skew and worker
+    count. A skew of k multiplies a number of `size` digits
+    by one of size / k digits. Worker counts only apply to
+    the parallel engines.
+
+    :param engines: []str
+    :param sizes: []int
+    :param skews: []int
+    :param workers: []int
+    :param repeats: int
+    :param warmup: int
+    :param seed: int
+    :rtype []dict
+    """
+    rng = random.Random(seed)
+    workers = workers or sorted({1, default_workers()})
+    results = []
+    for size in sizes:
+        for skew in skews:
+            x = random_number(size, rng)
+            y = random_number(max(1, size // skew), rng)
+            for engine in engines:
+                for count in (workers
+                              if engine in PARALLEL_ENGINES else [None]):
+                    result = benchmark_case(engine, x, y, count, repeats,
+                                            warmup)
+                    results.append(result)
+                    print(_describe(result))
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares results against a baseline run, printing the
+    change in median time for every case found in both.
+    Returns the cases that got slower by more than the
+    tolerance.
+
+    :param results: []dict
+    :param baseline: []dict
+    :param tolerance: float
+    :rtype []dict
+    """
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        change = result['median'] / old['median'] - 1
+        flag = ''
+        if change > tolerance:
+            flag = ' REGRESSION'
+            regressions.append(result)
+        print('{} {:+.1%}{}'.format(_label(result), change, flag))
+    return regressions
+
+
+def _key(result):
+    return (result['engine'], result['x_digits'], result['y_digits'],
+            result['workers'])
+
+
+def _label(result):
+    label = '{} {}x{} digits'.format(result['engine'], result['x_digits'],
+                                     result['y_digits'])
+    if result['workers'] is not None:
+        label += ' {} workers'.format(result['workers'])
+    return label
+
+
+def _describe(result):
+    return ('{}: {:.3f} ms median, {:.0f} digits/s, {} bytes peak, '
+            '{} child processes{}').format(
+                _label(result), result['median'] * 1000,
+                result['digits_per_second'] or 0, result['peak_memory'],
+                result['child_processes'],
+                '' if result['correct'] else ' WRONG ANSWER')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the multiplication algorithms.')
+    parser.add_argument('--engines', nargs='+', default=DEFAULT_ENGINES,
+                        choices=sorted(ENGINES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--skews', nargs='+', type=int, default=[1])
+    parser.add_argument('--workers', nargs='+', type=int)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    imports = [measure_import(module) for module in IMPORT_MODULES]
+    for result in imports:
+        print('import {}: {:.3f} ms, {} child processes'.format(
+            result['module'], result['seconds'] * 1000,
+            result['child_processes']))
+
+    results = run(args.engines, args.sizes, args.skews, args.workers,
+                  args.repeats, args.warmup, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpu_count': default_workers(),
+                'imports': imports,
+                'results': results,
+            }, f, indent=2)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'],
+                                  args.tolerance)
+
+    wrong = [result for result in results if not result['correct']]
+    if wrong or regressions:
+        sys.exit(1)
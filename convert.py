@@ -0,0 +1,206 @@
+"""
+This module implements conversion between Python
+ints and strs and numbers represented as arrays of
+digits, so that callers holding native ints can use
+the multiplication algorithms.
+
+Converting digit by digit, with repeated % 10 or
+by building up the number one digit at a time, is
+quadratic. Instead the conversions divide and
+conquer: the number is split around a power of ten
+10^(2^k), each half is converted recursively, and
+the halves are combined. The powers of ten are
+cached, since the same few are used over and over.
+"""
+
+import functools
+
+# below this many digits, let str() and int() do the work directly
+BASE_DIGITS = 256
+
+
+@functools.lru_cache(maxsize=None)
+def power_of_ten(exponent):
+    """
+    Returns 10^exponent, caching the result. The exponents
+    used by the conversions are all powers of two, so each
+    one is built by squaring the one before it.
+
+    :param exponent: int
+    :rtype int
+    """
+    if exponent > 1 and exponent & (exponent - 1) == 0:
+        half = power_of_ten(exponent // 2)
+        return half * half
+    return 10**exponent
+
+
+def int_to_digits(num):
+    """
+    Converts a non-negative int into a number
+    represented as an array of digits.
+
+    :param num: int
+    :rtype []int
+    """
+    if num < 0:
+        raise ValueError('only non-negative ints can be converted')
+    # find the smallest power of ten with 2^k digits bigger than num
+    width = BASE_DIGITS
+    while power_of_ten(width) <= num:
+        width *= 2
+    digits = []
+    _int_to_digits(num, width, digits)
+    # strip the leading zeros from padding the top half
+    i = 0
+    while i < len(digits) - 1 and digits[i] == 0:
+        i += 1
+    return digits[i:]
+
+
+def _int_to_digits(num, width, digits):
+    """
+    Appends exactly `width` digits of num, including any
+    leading zeros, to digits. width is a power of two
+    multiple of BASE_DIGITS and num < 10^width.
+
+    :param num: int
+    :param width: int
+    :param digits: []int
+    """
+    if width <= BASE_DIGITS:
+        digits.extend(map(int, str(num).zfill(width)))
+        return
+    half = width // 2
+    high, low = divmod(num, power_of_ten(half))
+    _int_to_digits(high, half, digits)
+    _int_to_digits(low, half, digits)
+
+
+def digits_to_int(num):
+    """
+    Converts a number represented as an array
+    of digits into an int.
+
+    :param num: []int
+    :rtype int
+    """
+    if len(num) <= BASE_DIGITS:
+        return int(''.join(map(str, num))) if num else 0
+    # split so that the low part has a power of two number of digits
+    half = BASE_DIGITS
+    while half * 2 < len(num):
+        half *= 2
+    high = digits_to_int(num[:len(num) - half])
+    low = digits_to_int(num[len(num) - half:])
+    return high * power_of_ten(half) + low
+
+
+def str_to_digits(string):
+    """
+    Converts a string of decimal digits into a
+    number represented as an array of digits.
+
+    :param string: str
+    :rtype []int
+    """
+    if not string.isdigit() or not string.isascii():
+        raise ValueError('not a string of decimal digits: {!r}'.format(
+            string[:20]))
+    digits = [ord(c) - 48 for c in string]
+    i = 0
+    while i < len(digits) - 1 and digits[i] == 0:
+        i += 1
+    return digits[i:]
+
+
+def digits_to_str(num):
+    """
+    Converts a number represented as an array of
+    digits into a string of decimal digits.
+
+    :param num: []int
+    :rtype str
+    """
+    return ''.join(map(str, num))
+
+
+def int_adapter(engine):
+    """
+    Wraps a multiplication algorithm that works on arrays
+    of digits so that it takes and returns ints instead.
+    The wrapper is named after the engine with an _int
+    suffix, and should be saved under that name in the
+    engine's module, so that pickle can find it there
+    and it can be sent to the worker pool.
+
+    :param engine: func([]int, []int) []int
+    :rtype func(int, int) int
+    """
+
+    @functools.wraps(engine)
+    def adapted(x, y):
+        return digits_to_int(engine(int_to_digits(x), int_to_digits(y)))
+
+    adapted.__name__ = engine.__name__ + '_int'
+    adapted.__qualname__ = engine.__qualname__ + '_int'
+    return adapted
+
+
+if __name__ == '__main__':
+    import random
+    import sys
+    from big_numbers import big_number, big_number_as_array
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+
+    print('testing int_to_digits')
+    assert int_to_digits(0) == [0]
+    assert int_to_digits(7) == [7]
+    assert int_to_digits(1024) == [1, 0, 2, 4]
+    assert int_to_digits(10**300) == [1] + [0] * 300
+    assert int_to_digits(big_number) == list(map(int, str(big_number)))
+
+    print('testing digits_to_int')
+    assert digits_to_int([0]) == 0
+    assert digits_to_int([0, 0, 4, 2]) == 42
+    assert digits_to_int([1] + [0] * 1000) == 10**1000
+    assert digits_to_int(big_number_as_array) == int(
+        ''.join(map(str, big_number_as_array)))
+
+    print('testing str_to_digits and digits_to_str')
+    assert str_to_digits('0') == [0]
+    assert str_to_digits('00120') == [1, 2, 0]
+    assert digits_to_str([1, 2, 0]) == '120'
+
+    for length in [1, 255, 256, 257, 5000]:
+        num = random.randrange(10**length)
+        assert digits_to_int(int_to_digits(num)) == num
+
+    print('testing int_adapter')
+    import pickle
+    from karatsuba import multiply_karatsuba_int
+    assert pickle.loads(
+        pickle.dumps(multiply_karatsuba_int)) is multiply_karatsuba_int
+    assert multiply_karatsuba_int(245, 67) == 16415
+    assert multiply_karatsuba_int(
+        12345678901234567890,
+        98765432109876543210) == 12345678901234567890 * 98765432109876543210
+
+    import time
+    num = random.randrange(10**50000)
+    start = time.time()
+    digits = int_to_digits(num)
+    end = time.time()
+    print('int_to_digits', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    digits_to_int(digits)
+    end = time.time()
+    print('digits_to_int', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    digits = []
+    while num:
+        num, digit = divmod(num, 10)
+        digits.append(digit)
+    end = time.time()
+    print('repeated divmod', (end - start) * 1000, 'milliseconds')
@@ -0,0 +1,94 @@
+"""
+This module implements integer multiplication
+using a vectorized version of the grade school
+algorithm. All of the pairwise digit products are
+summed into their columns at once, as a discrete
+convolution of the two digit arrays, and then the
+carries are resolved in one final pass. The
+algorithm has O(n^2) time complexity, but the inner
+loop runs inside NumPy rather than the interpreter.
+
+It can be used as the base case for the Karatsuba
+algorithms by passing it as `base`, e.g.
+
+    multiply_karatsuba(x, y, CONVOLUTION_THRESHOLD, multiply_convolution)
+"""
+
+import numpy as np
+
+from util import strip_leading_zeros
+
+# below this many digits, convolution beats a level of Karatsuba
+# recursion over digit lists (measured on 40000 digit operands)
+CONVOLUTION_THRESHOLD = 20000
+
+
+def multiply_convolution(x, y):
+    """
+    Multiplies two numbers represented as arrays by
+    convolving their digits to get the sum of products
+    for each column, then carrying to the left.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    # each column holds at most 81 * min(len(x), len(y)),
+    # which fits comfortably in 64 bits
+    columns = np.convolve(
+        np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64))
+    return carry_columns(columns.tolist())
+
+
+def carry_columns(columns):
+    """
+    Given the column sums of a product, most significant
+    first, resolves all of the carries in a single pass
+    from right to left.
+
+    :param columns: []int
+    :rtype []int
+    """
+    res = [0] * (len(columns) + 1)
+    carry = 0
+    for i in range(len(columns) - 1, -1, -1):
+        carry, res[i + 1] = divmod(columns[i] + carry, 10)
+    # the product of an n digit and m digit number
+    # has at most n + m digits, so one slot is enough
+    res[0] = carry
+    return strip_leading_zeros(res)
+
+
+if __name__ == '__main__':
+    from grade_school import multiply_simple
+    from karatsuba import multiply_karatsuba
+    from big_numbers import big_number_as_array
+
+    print('testing multiply_convolution')
+    assert multiply_convolution([0], [0]) == [0]
+    assert multiply_convolution([1], [0]) == [0]
+    assert multiply_convolution([1], [1]) == [1]
+    assert multiply_convolution([2], [3]) == [6]
+    assert multiply_convolution([2, 0], [3, 0]) == [6, 0, 0]
+    assert multiply_convolution([2, 4], [3, 5]) == [8, 4, 0]
+    assert multiply_convolution([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_convolution([0, 0, 9, 9], [9, 9, 9]) == [9, 8, 9, 0, 1]
+    small = big_number_as_array[:200]
+    assert multiply_convolution(small, small) == multiply_simple(small, small)
+
+    print('testing karatsuba with convolution base case')
+    assert multiply_karatsuba(
+        big_number_as_array, big_number_as_array, 64,
+        multiply_convolution) == multiply_convolution(
+            big_number_as_array, big_number_as_array)
+
+    import time
+    start = time.time()
+    multiply_convolution(big_number_as_array, big_number_as_array)
+    end = time.time()
+    print('convolution', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    multiply_karatsuba(big_number_as_array, big_number_as_array,
+                       CONVOLUTION_THRESHOLD, multiply_convolution)
+    end = time.time()
+    print('karatsuba with convolution', (end - start) * 1000, 'milliseconds')
@@ -0,0 +1,293 @@
+"""
+This module implements a single multiply(x, y) entry
+point that picks the fastest algorithm for the size
+of the numbers and the number of cores available.
+
+The sizes at which one algorithm overtakes another
+depend on the machine, so they are measured by running
+
+    python dispatcher.py calibrate
+
+which benchmarks every algorithm over a range of sizes
+and saves the crossover points to a profile file. The
+profile is loaded when this module is imported; if
+there isn't one, or it was measured with a different
+number of cores, some defaults measured on a
+development machine are used instead.
+"""
+
+import importlib.util
+import json
+import os
+import time
+import warnings
+
+from grade_school import multiply_simple
+from karatsuba import multiply_karatsuba
+from parallel_karatsuba import multiply_karatsuba_parallel
+from pool import default_workers
+from toom_cook import multiply_toom_3
+from unbalanced import UNBALANCED_RATIO, multiply_unbalanced
+from util import strip_leading_zeros
+
+# the NumPy based algorithms are only available if NumPy is installed
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+
+def multiply_convolution(x, y):
+    """
+    convolution.multiply_convolution, imported on the first
+    call so that importing this module doesn't import NumPy.
+    Defined here rather than wrapped so that it can be pickled.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    from convolution import multiply_convolution
+    return multiply_convolution(x, y)
+
+
+def multiply_ntt(x, y):
+    """
+    ntt.multiply_ntt, imported on the first call.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    from ntt import multiply_ntt
+    return multiply_ntt(x, y)
+
+
+PROFILE_PATH = os.environ.get(
+    'PARALLEL_MULTIPLICATION_PROFILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile.json'))
+
+ENGINES = {
+    'simple': multiply_simple,
+    'karatsuba': multiply_karatsuba,
+    'toom_3': multiply_toom_3,
+    'karatsuba_parallel': multiply_karatsuba_parallel,
+}
+if HAS_NUMPY:
+    ENGINES['convolution'] = multiply_convolution
+    ENGINES['ntt'] = multiply_ntt
+
+# engines that are only worth using with more than one core
+PARALLEL_ENGINES = {'karatsuba_parallel'}
+# engines that pad the shorter number up to the length of the longer one
+PADDING_ENGINES = {'simple', 'karatsuba', 'toom_3', 'karatsuba_parallel'}
+
+# each entry is [engine, digits] where the engine is used for
+# numbers of at least that many digits, until the next entry takes over
+if HAS_NUMPY:
+    DEFAULT_CROSSOVERS = [['convolution', 0], ['ntt', 2048]]
+else:
+    DEFAULT_CROSSOVERS = [['simple', 0], ['karatsuba', 4], ['toom_3', 256]]
+
+
+def load_profile(path=PROFILE_PATH):
+    """
+    Loads a calibration profile, falling back on the defaults
+    if there isn't one, it isn't laid out like a profile, it
+    names an engine we don't have, or it was calibrated with
+    a different number of cores, which moves the crossovers.
+
+    :param path: str
+    :rtype dict
+    """
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        if not all(engine in ENGINES for engine, _ in profile['crossovers']):
+            return {'cpu_count': None, 'crossovers': DEFAULT_CROSSOVERS}
+        if profile.get('cpu_count') == default_workers():
+            return profile
+        warnings.warn(
+            '{} was calibrated with {} cores but this machine has {}; '
+            'using the default crossovers, run `python dispatcher.py '
+            'calibrate` again to replace it'.format(
+                path, profile.get('cpu_count'), default_workers()))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {'cpu_count': None, 'crossovers': DEFAULT_CROSSOVERS}
+
+
+def save_profile(profile, path=PROFILE_PATH):
+    """
+    Saves a calibration profile as JSON.
+
+    :param profile: dict
+    :param path: str
+    """
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+
+_profile = load_profile()
+
+
+def choose_engine(length, profile=None, cores=None):
+    """
+    Picks the name of the engine to use for
+    numbers of the given length.
+
+    :param length: int
+    :param profile: dict
+    :param cores: int
+    :rtype str
+    """
+    profile = _profile if profile is None else profile
+    cores = default_workers() if cores is None else cores
+    chosen = None
+    for engine, digits in profile['crossovers']:
+        if engine in PARALLEL_ENGINES and cores < 2:
+            continue
+        if length >= digits:
+            chosen = engine
+    return chosen if chosen is not None else 'karatsuba'
+
+
+def multiply(x, y):
+    """
+    Multiplies two numbers represented as arrays
+    using whichever algorithm is fastest for
+    numbers of their size on this machine.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    short, long = sorted((len(x), len(y)))
+    name = choose_engine(long)
+    # rather than padding a much shorter number, cut the longer
+    # one into chunks and multiply those with a balanced engine
+    if name in PADDING_ENGINES and long >= UNBALANCED_RATIO * short:
+        cores = default_workers()
+        return multiply_unbalanced(x, y, multiply_serial,
+                                   cores if cores > 1 else None)
+    return strip_leading_zeros(ENGINES[name](x, y))
+
+
+def multiply_serial(x, y):
+    """
+    Multiplies two numbers represented as arrays using
+    whichever single-core algorithm is fastest for numbers
+    of their size, without splitting unbalanced numbers.
+    It never uses the worker pool, so it is safe to run
+    inside a pool worker, e.g. as the chunk engine of
+    multiply_unbalanced or the engine of multiply_many.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    name = choose_engine(max(len(x), len(y)), cores=1)
+    return strip_leading_zeros(ENGINES[name](x, y))
+
+
+def calibrate(max_digits=16384, budget=2.0, repeats=3):
+    """
+    Times every engine on random numbers of doubling
+    sizes up to max_digits, and records the size at
+    which each engine becomes the fastest. An engine
+    is dropped once a single multiplication takes
+    longer than `budget` seconds.
+
+    :param max_digits: int
+    :param budget: float
+    :param repeats: int
+    :rtype dict
+    """
+    import random
+    cores = default_workers()
+    engines = [
+        name for name in ENGINES
+        if cores > 1 or name not in PARALLEL_ENGINES
+    ]
+    crossovers = []
+    length = 1
+    while length <= max_digits and engines:
+        x = [random.randint(1, 9) for _ in range(length)]
+        y = [random.randint(1, 9) for _ in range(length)]
+        timings = {}
+        for name in engines:
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                ENGINES[name](x, y)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+                if elapsed > budget:
+                    break
+            timings[name] = best
+        fastest = min(timings, key=timings.get)
+        print(length, 'digits', fastest, timings[fastest] * 1000,
+              'milliseconds')
+        if not crossovers or crossovers[-1][0] != fastest:
+            crossovers.append([fastest, 0 if not crossovers else length])
+        engines = [name for name in engines if timings[name] <= budget]
+        length *= 2
+    return {'cpu_count': cores, 'crossovers': crossovers}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Multiply numbers using the fastest algorithm.')
+    subparsers = parser.add_subparsers(dest='command')
+    calibrate_parser = subparsers.add_parser(
+        'calibrate', help='measure the crossover points on this machine')
+    calibrate_parser.add_argument('--max-digits', type=int, default=16384)
+    calibrate_parser.add_argument('--budget', type=float, default=2.0)
+    calibrate_parser.add_argument('--profile', default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'calibrate':
+        profile = calibrate(args.max_digits, args.budget)
+        save_profile(profile, args.profile)
+        print('saved', profile['crossovers'], 'to', args.profile)
+    else:
+        from big_numbers import big_number_as_array
+
+        print('testing multiply')
+        assert multiply([0], [0]) == [0]
+        assert multiply([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+        assert multiply(big_number_as_array,
+                        big_number_as_array) == strip_leading_zeros(
+                            multiply_toom_3(big_number_as_array,
+                                            big_number_as_array))
+        assert multiply([2, 5], [1, 0, 0, 0, 0, 1]) == [2, 5, 0, 0, 0, 2, 5]
+        assert multiply_serial([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+        import pickle
+        for engine in ENGINES.values():
+            assert pickle.loads(pickle.dumps(engine)) is engine
+
+        import tempfile
+        for broken in ['{}', '[]', '{"crossovers": 5}',
+                       '{"crossovers": [["karatsuba"]]}', 'not json']:
+            with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+                f.write(broken)
+                f.flush()
+                assert load_profile(f.name)['crossovers'] == DEFAULT_CROSSOVERS
+        crossovers = [['simple', 0], ['karatsuba', 50]]
+        for cpu_count, loaded in [(default_workers(), crossovers),
+                                  (default_workers() + 1, DEFAULT_CROSSOVERS)]:
+            with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+                save_profile({'cpu_count': cpu_count,
+                              'crossovers': crossovers}, f.name)
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    assert load_profile(f.name)['crossovers'] == loaded
+                # only the profile from another machine is warned about
+                assert len(caught) == (loaded is DEFAULT_CROSSOVERS)
+        assert choose_engine(10, {'crossovers': [['simple', 0],
+                                                 ['karatsuba', 50]]}) == 'simple'
+        assert choose_engine(
+            10, {'crossovers': [['simple', 0], ['karatsuba_parallel', 5]]},
+            cores=1) == 'simple'
+        assert choose_engine(
+            10, {'crossovers': [['simple', 0], ['karatsuba_parallel', 5]]},
+            cores=4) == 'karatsuba_parallel'
@@ -0,0 +1,638 @@
+"""
+This module implements Karatsuba multiplication
+spread over several machines. The top levels of the
+recursion tree are unrolled by the coordinator, just
+as in multiply_karatsuba_parallel, and each leaf
+sub-product is sent over TCP to a worker, which might
+be on another host. The coordinator combines the
+products that come back with the usual add, subtract
+and pad shuffle.
+
+Run a worker on each host with
+
+    python distributed.py worker --host 0.0.0.0 --port 7000
+
+and multiply from the coordinator with
+
+    with Coordinator([('host-1', 7000), ('host-2', 7000)]) as coordinator:
+        coordinator.multiply(x, y)
+
+Workers only listen on localhost unless told otherwise,
+and don't authenticate anyone, so only expose them on a
+trusted network. A worker drops any connection that
+sends a message of more than --max-digits digits rather
+than allocating room for it. Each worker multiplies on
+a single core, so several workers on one host don't
+each start a pool of processes.
+
+Every message is a fixed header followed by two numbers
+packed two digits to a byte. A worker answers a task
+with its product, and echoes an echo message straight
+back, which the coordinator uses to measure the latency
+and bandwidth of the network. With those, and timings
+on the local machine of each engine the dispatcher would
+pick, of packing digits and of the adds that split and
+combine the tree, it estimates how long each split
+depth would take and picks the quickest, which might be
+not to split at all.
+
+If a worker's connection drops or times out, the tasks
+it had are handed to the remaining workers, and once no
+workers are left the coordinator finishes the rest
+itself. For testing, local_workers starts workers on
+localhost in separate processes.
+"""
+
+import argparse
+import contextlib
+import itertools
+import math
+import os
+import queue
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from dispatcher import ENGINES, choose_engine, multiply, multiply_serial
+from parallel_karatsuba import _resolve, _schedule
+from pool import default_workers
+from util import add
+
+TASK = 1
+RESULT = 2
+ECHO = 3
+# the message kind, the task id and the lengths of the two numbers
+HEADER = struct.Struct('<BQQQ')
+# the two digits packed into each byte value
+PAIRS = [(byte >> 4, byte & 15) for byte in range(256)]
+
+# below this many digits, a sub-product isn't worth sending anywhere
+DISTRIBUTED_THRESHOLD = 1000
+MAX_DEPTH = 8
+# the number of digits sent to measure the bandwidth
+SAMPLE_DIGITS = 200000
+# how long the longest timing of an engine should take, in seconds
+TIMING_BUDGET = 0.05
+# splitting a node of the tree and combining its products adds up
+# about this many times its length in digits, measured on _schedule
+# and _resolve
+TREE_DIGITS = 2.5
+# the most digits a message may carry, which bounds
+# how much a peer can make us allocate
+MAX_DIGITS = 10**8
+
+
+def pack_digits(num):
+    """
+    Packs a number represented as an array into bytes,
+    two digits to a byte, with a leading zero added if
+    it has an odd number of digits.
+
+    :param num: []int
+    :rtype bytes
+    """
+    if len(num) % 2:
+        num = [0] + num
+    return bytes(16 * a + b for a, b in zip(num[0::2], num[1::2]))
+
+
+def unpack_digits(data, length):
+    """
+    Unpacks a number of `length` digits packed by pack_digits.
+
+    :param data: bytes
+    :param length: int
+    :rtype []int
+    """
+    digits = list(itertools.chain.from_iterable(map(PAIRS.__getitem__, data)))
+    return digits[len(digits) - length:]
+
+
+def packed_size(length):
+    """
+    The number of bytes pack_digits packs `length` digits into.
+
+    :param length: int
+    :rtype int
+    """
+    return (length + 1) // 2
+
+
+def send_message(sock, kind, task_id, x, y):
+    """
+    Sends a message carrying two numbers over a socket.
+
+    :param sock: socket.socket
+    :param kind: int
+    :param task_id: int
+    :param x: []int
+    :param y: []int
+    """
+    sock.sendall(
+        HEADER.pack(kind, task_id, len(x), len(y)) + pack_digits(x) +
+        pack_digits(y))
+
+
+def receive_message(sock, max_digits=MAX_DIGITS):
+    """
+    Receives a message sent by send_message, returning
+    its kind, task id and two numbers. Raises ValueError,
+    before reading the numbers, if they add up to more
+    than max_digits digits.
+
+    :param sock: socket.socket
+    :param max_digits: int
+    :rtype (int, int, []int, []int)
+    """
+    kind, task_id, x_length, y_length = HEADER.unpack(
+        _receive(sock, HEADER.size))
+    if x_length + y_length > max_digits:
+        raise ValueError('message of {} digits is over the limit of {}'.format(
+            x_length + y_length, max_digits))
+    data = _receive(sock, packed_size(x_length) + packed_size(y_length))
+    split = packed_size(x_length)
+    return (kind, task_id, unpack_digits(data[:split], x_length),
+            unpack_digits(data[split:], y_length))
+
+
+def _receive(sock, size):
+    """
+    Receives exactly `size` bytes from a socket.
+
+    :param sock: socket.socket
+    :param size: int
+    :rtype bytes
+    """
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError('connection closed by the other end')
+        received += count
+    return bytes(data)
+
+
+class _WorkerHandler(socketserver.BaseRequestHandler):
+    """
+    Serves one coordinator's connection, answering
+    its messages until it disconnects.
+    """
+
+    def handle(self):
+        while True:
+            try:
+                kind, task_id, x, y = receive_message(self.request,
+                                                      self.server.max_digits)
+            except (ConnectionError, ValueError):
+                return
+            if kind == TASK:
+                send_message(self.request, RESULT, task_id,
+                             multiply_serial(x, y), [])
+            elif kind == ECHO:
+                send_message(self.request, ECHO, task_id, x, y)
+            else:
+                return
+
+
+class _WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    max_digits = MAX_DIGITS
+
+
+def serve(host='127.0.0.1', port=7000, max_digits=MAX_DIGITS):
+    """
+    Runs a worker, multiplying whatever sub-products
+    coordinators send it, until it is killed.
+
+    :param host: str, the interface to listen on
+    :param port: int, or 0 for any free port
+    :param max_digits: int, the most digits a message may carry
+    """
+    with _WorkerServer((host, port), _WorkerHandler) as server:
+        server.max_digits = max_digits
+        host, port = server.server_address[:2]
+        print('listening on', host, port, flush=True)
+        server.serve_forever()
+
+
+@contextlib.contextmanager
+def local_workers(count):
+    """
+    Starts `count` workers on localhost, each in its own
+    process, and yields their addresses. The workers are
+    killed on exit.
+
+    :param count: int
+    :rtype [(str, int)]
+    """
+    processes = []
+    try:
+        addresses = []
+        for _ in range(count):
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), 'worker',
+                 '--host', '127.0.0.1', '--port', '0'],
+                stdout=subprocess.PIPE, text=True)
+            processes.append(process)
+            _, _, host, port = process.stdout.readline().split()
+            addresses.append((host, int(port)))
+        yield addresses
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+
+
+class Coordinator:
+    """
+    Connects to a set of workers and multiplies numbers
+    represented as arrays by sending sub-products to them.
+    Use it as a context manager.
+    """
+    __slots__ = ('addresses', 'timeout', 'connections', 'latency',
+                 'bandwidth', 'add_cost', 'pack_cost', 'fits')
+
+    def __init__(self, addresses, timeout=None):
+        """
+        :param addresses: [(str, int)]
+        :param timeout: float, seconds to wait on a worker before
+            giving its task to another, or None to wait as long as
+            the connection is up
+        """
+        self.addresses = addresses
+        self.timeout = timeout
+        self.connections = []
+        # seconds per message and digits per second over the network
+        self.latency = None
+        self.bandwidth = None
+        # seconds per digit to add, and to pack and unpack
+        self.add_cost = None
+        self.pack_cost = None
+        # (scale, exponent) by engine name, where multiplying n
+        # digits takes scale * n^exponent seconds
+        self.fits = {}
+
+    def __enter__(self):
+        for address in self.addresses:
+            try:
+                self.connections.append(
+                    socket.create_connection(address, self.timeout))
+            except OSError:
+                # a worker that can't be reached just doesn't get tasks
+                pass
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+    def measure(self, sample_digits=SAMPLE_DIGITS):
+        """
+        Measures the round trip latency and bandwidth to the
+        first worker by echoing an empty and a large message,
+        and how fast this machine adds and packs digits.
+
+        :param sample_digits: int
+        """
+        self.add_cost, self.pack_cost = _measure_digit_costs()
+        if not self.connections:
+            return
+        connection = self.connections[0]
+        start = time.perf_counter()
+        send_message(connection, ECHO, 0, [], [])
+        receive_message(connection)
+        self.latency = time.perf_counter() - start
+
+        sample = [7] * sample_digits
+        start = time.perf_counter()
+        send_message(connection, ECHO, 0, sample, [])
+        receive_message(connection)
+        elapsed = max(time.perf_counter() - start - self.latency, 1e-9)
+        # the sample went there and back
+        self.bandwidth = 2 * sample_digits / elapsed
+
+    def local_seconds(self, length, cores=None):
+        """
+        Estimates how many seconds dispatcher.multiply takes
+        on two numbers of `length` digits here, from timings
+        of the engine it would pick, fitting each engine once.
+        With cores=1 it estimates multiply_serial instead, as
+        run by the workers.
+
+        :param length: int
+        :param cores: int
+        :rtype float
+        """
+        name = choose_engine(length, cores=cores)
+        if name not in self.fits:
+            self.fits[name] = _fit_engine(name)
+        scale, exponent = self.fits[name]
+        return scale * length**exponent
+
+    def parallelism(self):
+        """
+        How many tasks the workers can really run at once.
+        Workers on this machine share its cores, so together
+        they count for no more than the number of cores.
+
+        :rtype int
+        """
+        local = 0
+        remote = 0
+        for connection in self.connections:
+            if connection.getpeername()[0] in ('127.0.0.1', '::1'):
+                local += 1
+            else:
+                remote += 1
+        return max(1, remote + min(local, default_workers()))
+
+    def estimate(self, length, depth):
+        """
+        Estimates how many seconds multiplying two numbers of
+        `length` digits would take when split `depth` levels
+        deep, or done locally if depth is 0. The workers are
+        assumed to be as fast as this machine, and the tasks
+        are shared evenly among them. On top of the time the
+        workers spend multiplying, each task's operands and
+        product are packed and unpacked at both ends and cross
+        the network once, and the tree is split and combined
+        here.
+
+        :param length: int
+        :param depth: int
+        :rtype float
+        """
+        if depth == 0 or not self.connections:
+            return self.local_seconds(length)
+        tasks = 3**depth
+        leaf = length / 2**depth
+        rounds = math.ceil(tasks / self.parallelism())
+        compute = rounds * self.local_seconds(leaf, cores=1)
+        # two operands out and a product of the same size back
+        digits = 4 * leaf
+        transfer = rounds * self.latency + tasks * digits / self.bandwidth
+        packing = (tasks + rounds) * digits * self.pack_cost
+        tree = sum(3**level * TREE_DIGITS * length / 2**level
+                   for level in range(depth)) * self.add_cost
+        return compute + transfer + packing + tree
+
+    def choose_depth(self, length):
+        """
+        Picks the split depth with the shortest estimated time,
+        measuring the network and this machine first if that
+        hasn't been done yet.
+
+        :param length: int
+        :rtype int
+        """
+        if self.add_cost is None:
+            self.measure()
+        depths = [0]
+        for depth in range(1, MAX_DEPTH + 1):
+            if length / 2**depth < DISTRIBUTED_THRESHOLD / 2:
+                break
+            depths.append(depth)
+        return min(depths, key=lambda depth: self.estimate(length, depth))
+
+    def multiply(self, x, y, depth=None):
+        """
+        Multiplies two numbers represented as arrays,
+        sending the sub-products of the top `depth` levels
+        of the Karatsuba recursion to the workers.
+
+        :param x: []int
+        :param y: []int
+        :param depth: int, or None to choose one
+        :rtype []int
+        """
+        if depth is None:
+            depth = self.choose_depth(max(len(x), len(y)))
+        if depth == 0:
+            return multiply(x, y)
+        leaves = []
+        tree = _schedule(x, y, depth, leaves)
+        return _resolve(tree, self._multiply_leaves(leaves))
+
+    def _multiply_leaves(self, leaves):
+        """
+        Multiplies every leaf sub-product, each worker taking
+        the next task off a shared queue as soon as it's done
+        with its last one. A task whose worker fails goes back
+        on the queue, and the worker is dropped. Whatever is
+        left once every worker has been dropped is done here.
+
+        :param leaves: [([]int, []int)]
+        :rtype [][]int
+        """
+        tasks = queue.Queue()
+        for task_id in range(len(leaves)):
+            tasks.put(task_id)
+        results = [None] * len(leaves)
+        failed = []
+
+        def work(connection):
+            while True:
+                try:
+                    task_id = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    send_message(connection, TASK, task_id, *leaves[task_id])
+                    kind, answered, product, _ = receive_message(connection)
+                    if kind != RESULT or answered != task_id:
+                        raise ConnectionError('unexpected answer from worker')
+                except (OSError, ValueError):
+                    tasks.put(task_id)
+                    failed.append(connection)
+                    return
+                results[task_id] = product
+
+        # a task can be put back after the other workers have
+        # found the queue empty and stopped, so go round again
+        while not tasks.empty() and self.connections:
+            threads = [
+                threading.Thread(target=work, args=(connection, ))
+                for connection in self.connections
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for connection in failed:
+                connection.close()
+            self.connections = [
+                connection for connection in self.connections
+                if connection not in failed
+            ]
+            failed.clear()
+
+        while not tasks.empty():
+            task_id = tasks.get_nowait()
+            results[task_id] = multiply(*leaves[task_id])
+        return results
+
+
+def multiply_distributed(x, y, addresses, depth=None):
+    """
+    Multiplies two numbers represented as arrays with
+    the workers at `addresses`.
+
+    :param x: []int
+    :param y: []int
+    :param addresses: [(str, int)]
+    :param depth: int, or None to choose one
+    :rtype []int
+    """
+    with Coordinator(addresses) as coordinator:
+        return coordinator.multiply(x, y, depth)
+
+
+def _fit_engine(name, budget=TIMING_BUDGET):
+    """
+    Times one engine on doubling lengths until a run takes
+    `budget` seconds, and fits seconds = scale * length^exponent
+    to the last two timings. The engine is run once first, so
+    that importing it and warming up don't count.
+
+    :param name: str
+    :param budget: float
+    :rtype (float, float)
+    """
+    engine = ENGINES[name]
+    engine([7] * 16, [3] * 16)
+    timings = []
+    length = 32
+    while not timings or timings[-1][1] < budget and length < 2**20:
+        x = [7] * length
+        y = [3] * length
+        start = time.perf_counter()
+        engine(x, y)
+        timings.append((length, max(time.perf_counter() - start, 1e-9)))
+        length *= 2
+    if len(timings) < 2:
+        return timings[0][1] / timings[0][0], 1
+    (small, small_time), (large, large_time) = timings[-2:]
+    exponent = min(2, max(1, math.log(large_time / small_time, large / small)))
+    return large_time / large**exponent, exponent
+
+
+def _measure_digit_costs(length=20000):
+    """
+    Times adding two numbers, and packing and unpacking
+    one, returning the seconds taken per digit for each.
+
+    :param length: int
+    :rtype (float, float)
+    """
+    num = [7] * length
+    start = time.perf_counter()
+    add(num, num)
+    add_cost = (time.perf_counter() - start) / length
+    start = time.perf_counter()
+    unpack_digits(pack_digits(num), length)
+    return add_cost, (time.perf_counter() - start) / length
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Multiply numbers on several machines.')
+    subparsers = parser.add_subparsers(dest='command')
+    worker_parser = subparsers.add_parser(
+        'worker', help='run a worker that multiplies sub-products')
+    worker_parser.add_argument('--host', default='127.0.0.1')
+    worker_parser.add_argument('--port', type=int, default=7000)
+    worker_parser.add_argument('--max-digits', type=int, default=MAX_DIGITS)
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        serve(args.host, args.port, args.max_digits)
+    else:
+        import random
+        from convolution import multiply_convolution
+        from util import strip_leading_zeros
+        from big_numbers import big_number_as_array
+
+        print('testing pack_digits and unpack_digits')
+        assert pack_digits([1, 2, 3]) == bytes([0x01, 0x23])
+        assert unpack_digits(pack_digits([1, 2, 3]), 3) == [1, 2, 3]
+        assert unpack_digits(pack_digits([0, 9, 9, 0]), 4) == [0, 9, 9, 0]
+        assert unpack_digits(pack_digits([]), 0) == []
+
+        print('testing the worker')
+        import pool
+        expected = multiply_convolution(big_number_as_array,
+                                        big_number_as_array)
+        with _WorkerServer(('127.0.0.1', 0), _WorkerHandler) as server:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            with socket.create_connection(server.server_address) as connection:
+                send_message(connection, TASK, 5, big_number_as_array,
+                             big_number_as_array)
+                assert receive_message(connection) == (RESULT, 5, expected,
+                                                       [])
+            server.shutdown()
+        # the worker multiplied without starting a pool of its own
+        assert not pool._pools
+
+        with local_workers(3) as addresses:
+            print('testing Coordinator')
+            with Coordinator(addresses) as coordinator:
+                assert strip_leading_zeros(
+                    coordinator.multiply([2, 4, 5], [6, 7],
+                                         depth=1)) == [1, 6, 4, 1, 5]
+                assert strip_leading_zeros(
+                    coordinator.multiply(big_number_as_array,
+                                         big_number_as_array,
+                                         depth=2)) == expected
+                assert 0 <= coordinator.choose_depth(100000) <= MAX_DEPTH
+                assert coordinator.choose_depth(10) == 0
+
+            print('testing oversized messages')
+            with socket.create_connection(addresses[0]) as connection:
+                connection.sendall(HEADER.pack(TASK, 0, 2**62, 2**62))
+                # the worker hangs up rather than trying to read them
+                assert connection.recv(1) == b''
+
+            print('testing retrying lost tasks')
+            with Coordinator(addresses + [('127.0.0.1', 1)]) as coordinator:
+                # the worker on port 1 couldn't be reached
+                assert len(coordinator.connections) == 3
+                coordinator.connections[0].shutdown(socket.SHUT_RDWR)
+                assert strip_leading_zeros(
+                    coordinator.multiply(big_number_as_array,
+                                         big_number_as_array,
+                                         depth=2)) == expected
+                assert len(coordinator.connections) == 2
+                for connection in coordinator.connections:
+                    connection.shutdown(socket.SHUT_RDWR)
+                assert strip_leading_zeros(
+                    coordinator.multiply(big_number_as_array,
+                                         big_number_as_array,
+                                         depth=1)) == expected
+                assert not coordinator.connections
+
+            x = [random.randint(0, 9) for _ in range(50000)]
+            y = [random.randint(0, 9) for _ in range(50000)]
+            with Coordinator(addresses) as coordinator:
+                coordinator.measure()
+                print('latency', coordinator.latency * 1000, 'milliseconds,',
+                      'bandwidth', coordinator.bandwidth, 'digits/second')
+                print('chose depth', coordinator.choose_depth(len(x)))
+                for depth in range(3):
+                    start = time.time()
+                    coordinator.multiply(x, y, depth)
+                    end = time.time()
+                    print('depth', depth, (end - start) * 1000,
+                          'milliseconds, estimated',
+                          coordinator.estimate(len(x), depth) * 1000)
@@ -6,7 +6,8 @@ O(n) space complexity.
 """
 
 from util import carry_left, match_padding, pad, pad_if_needed, strip_leading_zeros
-from big_numbers import big_number, big_number_as_array
+from limbs import LimbNumber, check_compatible
+from convert import int_adapter
 
 
 def multiply_simple(x, y):
@@ -17,13 +18,20 @@ def multiply_simple(x, y):
     a pairwise multiplication results in a number larger
     than 9.
 
-    :param x: []int
-    :param y: []int
-    :rtype []int
+    :param x: []int|LimbNumber
+    :param y: []int|LimbNumber
+    :rtype []int|LimbNumber
     """
+    if isinstance(x, LimbNumber):
+        return multiply_simple_limbs(x, y)
+
     # Pad the shorter number with leading zeros
     x, y = match_padding(x, y)
 
+    # squaring only needs half of the pairwise multiplications
+    if x == y:
+        return square_simple(x)
+
     # Create a new list for the result
     res = [0] * len(x)
 
@@ -54,7 +62,66 @@ def multiply_simple(x, y):
     return strip_leading_zeros(res)
 
 
+def square_simple(x):
+    """
+    Squares a number represented as an array using
+    the grade school algorithm. Each cross term
+    x_i * x_j turns up twice in a square, so it is
+    only worked out once and added in twice.
+
+    :param x: []int
+    :rtype []int
+    """
+    res = [0] * len(x)
+
+    for i in range(len(x)):
+        # only visit each pair of digits once
+        for j in range(i, len(x)):
+            cardinality = i + j
+            a = x[len(x) - (i + 1)]
+            b = x[len(x) - (j + 1)]
+            if a > 0 and b > 0:
+                # a cross term counts double, the diagonal counts once
+                times = a if i == j else 2 * a
+                for _ in range(times):
+                    res = pad_if_needed(res, cardinality)
+                    res[len(res) - (cardinality + 1)] += b
+                res = carry_left(res, cardinality)
+
+    return strip_leading_zeros(res)
+
+
+def multiply_simple_limbs(x, y):
+    """
+    Multiplies two numbers represented as limbs using
+    the grade school algorithm. Each limb product is
+    accumulated into its column without carrying, and
+    the carries are all resolved in a single pass at
+    the end.
+
+    :param x: LimbNumber
+    :param y: LimbNumber
+    :rtype LimbNumber
+    """
+    digits_per_limb = check_compatible(x, y)
+    base = 10**digits_per_limb
+    res = [0] * (len(x) + len(y))
+    for i, a in enumerate(x.limbs):
+        if a > 0:
+            for j, b in enumerate(y.limbs):
+                res[i + j] += a * b
+    carry = 0
+    for i in range(len(res)):
+        carry, res[i] = divmod(res[i] + carry, base)
+    return LimbNumber(res, digits_per_limb)
+
+
+# the same algorithm, taking and returning Python ints
+multiply_simple_int = int_adapter(multiply_simple)
+
+
 if __name__ == '__main__':
+    from big_numbers import big_number, big_number_as_array
 
     print('testing multiply_simple')
     assert multiply_simple([0], [0]) == [0]
@@ -65,12 +132,39 @@ if __name__ == '__main__':
     assert multiply_simple([2, 4], [3, 5]) == [8, 4, 0]
     assert multiply_simple([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
 
+    print('testing square_simple')
+    assert square_simple([0]) == [0]
+    assert square_simple([9]) == [8, 1]
+    assert square_simple([9, 9, 9]) == [9, 9, 8, 0, 0, 1]
+    assert square_simple([1, 0, 2]) == [1, 0, 4, 0, 4]
+    assert square_simple(big_number_as_array[:100]) == list(
+        map(int, str(int(''.join(map(str, big_number_as_array[:100])))**2)))
+
+    print('testing multiply_simple_limbs')
+    assert multiply_simple(LimbNumber.from_digits([2, 4, 5], 1),
+                           LimbNumber.from_digits([6, 7], 1)).to_digits() == [
+                               1, 6, 4, 1, 5]
+    assert multiply_simple(
+        LimbNumber.from_digits(big_number_as_array[:300], 4),
+        LimbNumber.from_digits(big_number_as_array[:300], 4)).to_digits(
+        ) == multiply_simple(big_number_as_array[:300],
+                             big_number_as_array[:300])
+
     import time
     start = time.time()
     multiply_simple(big_number_as_array, big_number_as_array)
     end = time.time()
     print('naive', (end - start) * 1000, 'milliseconds')
     start = time.time()
+    multiply_simple(big_number_as_array, big_number_as_array[:-1] + [0])
+    end = time.time()
+    print('naive without squaring', (end - start) * 1000, 'milliseconds')
+    limb_number = LimbNumber.from_digits(big_number_as_array)
+    start = time.time()
+    multiply_simple(limb_number, limb_number)
+    end = time.time()
+    print('naive limbs', (end - start) * 1000, 'milliseconds')
+    start = time.time()
     big_number * big_number
     end = time.time()
     print('native', (end - start) * 1000, 'milliseconds')
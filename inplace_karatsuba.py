@@ -0,0 +1,182 @@
+"""
+This module implements integer multiplication
+using a recursive implementation of the Karatsuba
+algorithm that doesn't allocate as it recurses.
+The algorithm has O(n^1.58) time complexity and
+O(n) space complexity.
+
+Everything is done in three lists that are allocated
+up front: the result, and a single scratch workspace
+sized for the whole recursion. Rather than slicing
+the numbers in half, each level works on views of
+them given as an offset and a length. The digits
+are treated as the coefficients of a polynomial, so
+the partial results are accumulated in place without
+carrying, and all of the carries are resolved with
+divmod in one pass at the end.
+
+Internally the digits are stored least significant
+first, so that a digit's offset is its cardinality.
+"""
+
+from util import strip_leading_zeros
+
+# below this many digits, multiply the views directly
+INPLACE_THRESHOLD = 32
+
+
+def multiply_karatsuba_inplace(x, y, threshold=INPLACE_THRESHOLD):
+    """
+    Multiplies two numbers represented as arrays
+    using the Karatsuba algorithm on a preallocated
+    workspace, falling back on grade school
+    multiplication for views of no more than
+    `threshold` digits.
+
+    :param x: []int
+    :param y: []int
+    :param threshold: int
+    :rtype []int
+    """
+    threshold = max(1, threshold)
+    length = max(len(x), len(y))
+    # reverse and pad each number once, up front
+    a = x[::-1] + [0] * (length - len(x))
+    b = y[::-1] + [0] * (length - len(y))
+    res = [0] * (2 * length)
+    scratch = [0] * scratch_size(length, threshold)
+
+    _multiply(a, 0, b, 0, length, res, 0, scratch, 0, threshold)
+
+    # resolve all of the carries in one pass; the product
+    # of two n digit numbers always fits in 2n digits
+    carry = 0
+    for i in range(len(res)):
+        carry, res[i] = divmod(res[i] + carry, 10)
+    res.reverse()
+    return strip_leading_zeros(res)
+
+
+def scratch_size(length, threshold=INPLACE_THRESHOLD):
+    """
+    Works out how much scratch space the recursion needs
+    for numbers of the given length. Each level needs
+    room for the two sums of halves and their product,
+    on top of what the level below it needs, which adds
+    up to about 4 * length.
+
+    :param length: int
+    :param threshold: int
+    :rtype int
+    """
+    size = 0
+    while length > threshold:
+        length -= length // 2
+        size += 4 * length
+    return size
+
+
+def _multiply(x, x_offset, y, y_offset, length, res, res_offset, scratch,
+              scratch_offset, threshold):
+    """
+    Multiplies the `length` digit views of x and y starting
+    at the given offsets, overwriting the 2 * length digits
+    of res starting at res_offset with the (uncarried)
+    product. scratch is free to use from scratch_offset on.
+
+    :param x: []int
+    :param x_offset: int
+    :param y: []int
+    :param y_offset: int
+    :param length: int
+    :param res: []int
+    :param res_offset: int
+    :param scratch: []int
+    :param scratch_offset: int
+    :param threshold: int
+    """
+    if length <= threshold:
+        for i in range(res_offset, res_offset + 2 * length):
+            res[i] = 0
+        for i in range(length):
+            a = x[x_offset + i]
+            if a:
+                offset = res_offset + i
+                for j in range(length):
+                    res[offset + j] += a * y[y_offset + j]
+        return
+
+    # the low half has `low` digits, the high half `high`
+    low = length // 2
+    high = length - low
+
+    # the products of the low halves and of the high halves
+    # go straight into their places in res, side by side
+    _multiply(x, x_offset, y, y_offset, low, res, res_offset, scratch,
+              scratch_offset, threshold)
+    _multiply(x, x_offset + low, y, y_offset + low, high, res,
+              res_offset + 2 * low, scratch, scratch_offset, threshold)
+
+    # lay out the sums of the halves and their product in scratch
+    x_sum = scratch_offset
+    y_sum = x_sum + high
+    middle = y_sum + high
+    for i in range(high):
+        scratch[x_sum + i] = x[x_offset + low + i]
+        scratch[y_sum + i] = y[y_offset + low + i]
+    for i in range(low):
+        scratch[x_sum + i] += x[x_offset + i]
+        scratch[y_sum + i] += y[y_offset + i]
+    _multiply(scratch, x_sum, scratch, y_sum, high, scratch, middle, scratch,
+              middle + 2 * high, threshold)
+
+    # the middle term is the product of the sums minus the other two
+    # products, and it gets added in shifted by `low` digits
+    for i in range(2 * low):
+        scratch[middle + i] -= res[res_offset + i]
+    for i in range(2 * high):
+        scratch[middle + i] -= res[res_offset + 2 * low + i]
+    offset = res_offset + low
+    for i in range(2 * high):
+        res[offset + i] += scratch[middle + i]
+
+
+if __name__ == '__main__':
+    import random
+    from karatsuba import multiply_karatsuba
+    from big_numbers import big_number_as_array
+
+    print('testing multiply_karatsuba_inplace')
+    assert multiply_karatsuba_inplace([0], [0]) == [0]
+    assert multiply_karatsuba_inplace([1], [0]) == [0]
+    assert multiply_karatsuba_inplace([2, 4], [3, 5]) == [8, 4, 0]
+    assert multiply_karatsuba_inplace([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_karatsuba_inplace([9, 9, 9], [9, 9, 9],
+                                      threshold=1) == [9, 9, 8, 0, 0, 1]
+    for length in [1, 2, 5, 33, 100, 257]:
+        for threshold in [1, 4, 32]:
+            x = [random.randint(0, 9) for _ in range(length)]
+            y = [random.randint(0, 9) for _ in range(random.randint(1, length))]
+            assert multiply_karatsuba_inplace(
+                x, y, threshold) == strip_leading_zeros(
+                    multiply_karatsuba(x, y))
+
+    import time
+    import tracemalloc
+    start = time.time()
+    multiply_karatsuba_inplace(big_number_as_array, big_number_as_array)
+    end = time.time()
+    print('karatsuba inplace', (end - start) * 1000, 'milliseconds')
+    tracemalloc.start()
+    multiply_karatsuba_inplace(big_number_as_array, big_number_as_array)
+    print('karatsuba inplace', tracemalloc.get_traced_memory()[1],
+          'bytes peak')
+    tracemalloc.stop()
+    start = time.time()
+    multiply_karatsuba(big_number_as_array, big_number_as_array)
+    end = time.time()
+    print('karatsuba', (end - start) * 1000, 'milliseconds')
+    tracemalloc.start()
+    multiply_karatsuba(big_number_as_array, big_number_as_array)
+    print('karatsuba', tracemalloc.get_traced_memory()[1], 'bytes peak')
+    tracemalloc.stop()
@@ -0,0 +1,343 @@
+"""
+This module implements opt-in instrumentation of
+the multiplication algorithms, to see where the time
+goes inside a multiplication: in carry_left, in
+copying digits around in pad and match_padding, in
+the Karatsuba recursion itself or in the worker pool.
+
+Nothing is instrumented until a Profiler is entered.
+It then swaps every function it watches for a wrapper
+that records its calls, everywhere the function is
+referenced: in module globals, in the dicts of engines,
+and in default arguments such as `base=multiply_simple`.
+The originals are put back when the Profiler exits, so
+outside of it there is no overhead at all:
+
+    with Profiler() as profiler:
+        multiply_karatsuba(x, y)
+    print(profiler.report())
+    profiler.write_folded('karatsuba.folded')
+
+For every function, and for every depth of the Karatsuba
+recursion it is called at, the profiler counts the calls,
+the digits passed in, the net number of memory blocks
+allocated (negative if it freed more than it kept) and the
+wall time. Time and blocks are counted exclusive of the
+watched functions called underneath, so they add up. The
+worker processes of multiply_karatsuba_parallel report
+how long each of their tasks took.
+
+The folded stacks can be turned into a flame graph with
+flamegraph.pl or speedscope, with one sample for every
+microsecond spent in a stack.
+"""
+
+import collections
+import functools
+import importlib
+import os
+import sys
+import time
+import types
+
+from limbs import LimbNumber
+
+# the functions to watch, by module
+WATCHED = {
+    'util': [
+        'add', 'carry_left', 'match_padding', 'pad', 'pad_if_needed',
+        'split', 'strip_leading_zeros', 'subtract'
+    ],
+    'grade_school': ['multiply_simple', 'square_simple'],
+    'karatsuba': [
+        'multiply_karatsuba', 'square_karatsuba',
+        'multiply_karatsuba_subtractive', 'multiply_karatsuba_limbs'
+    ],
+    'parallel_karatsuba': [
+        'multiply_karatsuba_parallel', '_schedule', '_schedule_limbs',
+        '_multiply_shared_leaves', '_resolve'
+    ],
+    'pool': ['get_pool'],
+}
+# the recursive functions whose nesting counts as the Karatsuba depth
+RECURSIVE = {
+    'multiply_karatsuba', 'square_karatsuba',
+    'multiply_karatsuba_subtractive', 'multiply_karatsuba_limbs'
+}
+
+# the statistics for one function at one depth
+Stats = collections.namedtuple('Stats',
+                               ['calls', 'digits', 'blocks', 'seconds'])
+
+
+class Profiler:
+    """
+    A context manager that instruments the functions in
+    `watched` while it is entered, and collects statistics
+    about the calls made to them.
+    """
+    __slots__ = ('watched', 'stats', 'stacks', 'workers', '_depth', '_stack',
+                 '_patches')
+
+    def __init__(self, watched=None):
+        """
+        :param watched: {str: []str}, function names by module name
+        """
+        self.watched = WATCHED if watched is None else watched
+        # [calls, digits, blocks, seconds] by (function, depth)
+        self.stats = collections.defaultdict(lambda: [0, 0, 0, 0.0])
+        # seconds spent by folded stack
+        self.stacks = collections.Counter()
+        # task timings in seconds by worker process id
+        self.workers = collections.defaultdict(list)
+        self._depth = 0
+        # one [name, children's seconds, children's blocks] per active call
+        self._stack = []
+        self._patches = []
+
+    def __enter__(self):
+        originals = {}
+        for module_name, names in self.watched.items():
+            module = importlib.import_module(module_name)
+            for name in names:
+                func = getattr(module, name)
+                originals[id(func)] = self._wrap(name, func)
+        self._install(originals)
+        return self
+
+    def __exit__(self, *exc_info):
+        # undo the patches in reverse, in case one was patched twice
+        for target, key, original in reversed(self._patches):
+            if isinstance(target, dict):
+                target[key] = original
+            else:
+                setattr(target, key, original)
+        self._patches = []
+
+    def _install(self, wrappers):
+        """
+        Replaces every reference to a watched function in
+        the modules of this package with its wrapper.
+
+        :param wrappers: {int: func}, wrappers by id of the original
+        """
+        directory = os.path.dirname(os.path.abspath(__file__))
+        modules = [
+            module for module in list(sys.modules.values())
+            if getattr(module, '__file__', None)
+            and os.path.dirname(os.path.abspath(module.__file__)) == directory
+        ]
+        for module in modules:
+            for key, value in list(vars(module).items()):
+                if isinstance(value, types.FunctionType) and any(
+                        id(default) in wrappers
+                        for default in value.__defaults__ or ()):
+                    self._patch(value, '__defaults__', tuple(
+                        wrappers.get(id(default), default)
+                        for default in value.__defaults__))
+                if id(value) in wrappers:
+                    self._patch(module, key, wrappers[id(value)])
+                elif isinstance(value, dict):
+                    for name, item in list(value.items()):
+                        if id(item) in wrappers:
+                            self._patch(value, name, wrappers[id(item)])
+        if 'parallel_karatsuba' in sys.modules:
+            self._patch(sys.modules['parallel_karatsuba'], '_record_worker',
+                        self._record_worker)
+
+    def _patch(self, target, key, value):
+        """
+        Sets an attribute, or an item if target is a dict,
+        remembering the old value to put back on exit.
+
+        :param target: object|dict
+        :param key: str
+        :param value: *
+        """
+        if isinstance(target, dict):
+            self._patches.append((target, key, target[key]))
+            target[key] = value
+        else:
+            self._patches.append((target, key, getattr(target, key)))
+            setattr(target, key, value)
+
+    def _wrap(self, name, func):
+        """
+        Returns a wrapper for func that records its calls.
+
+        :param name: str
+        :param func: func
+        :rtype func
+        """
+        recursive = name in RECURSIVE
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            depth = self._depth
+            if recursive:
+                self._depth += 1
+            frame = [name, 0.0, 0]
+            self._stack.append(frame)
+            blocks = sys.getallocatedblocks()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                allocated = sys.getallocatedblocks() - blocks
+                self._stack.pop()
+                if recursive:
+                    self._depth -= 1
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+                    self._stack[-1][2] += allocated
+                stats = self.stats[name, depth]
+                stats[0] += 1
+                stats[1] += _count_digits(args)
+                stats[2] += allocated - frame[2]
+                stats[3] += elapsed - frame[1]
+                stack = ';'.join(f[0] for f in self._stack)
+                self.stacks[stack + ';' + name if stack else
+                            name] += elapsed - frame[1]
+
+        return wrapper
+
+    def _record_worker(self, pid, elapsed):
+        self.workers[pid].append(elapsed)
+
+    def by_function(self):
+        """
+        The statistics for every function, over all depths.
+
+        :rtype {str: Stats}
+        """
+        totals = collections.defaultdict(lambda: [0, 0, 0, 0.0])
+        for (name, _), stats in self.stats.items():
+            totals[name] = [a + b for a, b in zip(totals[name], stats)]
+        return {name: Stats(*stats) for name, stats in totals.items()}
+
+    def by_depth(self):
+        """
+        The statistics for every function at every depth
+        of the Karatsuba recursion.
+
+        :rtype {(str, int): Stats}
+        """
+        return {key: Stats(*stats) for key, stats in self.stats.items()}
+
+    def report(self):
+        """
+        Describes the statistics as tables, the most
+        expensive functions first.
+
+        :rtype str
+        """
+        lines = ['{:<30}{:>10}{:>12}{:>12}{:>12}'.format(
+            'function', 'calls', 'digits', 'net blocks', 'ms')]
+        for name, stats in sorted(self.by_function().items(),
+                                  key=lambda item: -item[1].seconds):
+            lines.append(_format_row(name, stats))
+
+        lines.append('')
+        lines.append('{:<30}{:>10}{:>12}{:>12}{:>12}'.format(
+            'depth', 'calls', 'digits', 'net blocks', 'ms'))
+        rows = sorted(self.by_depth().items(),
+                      key=lambda item: (item[0][1], -item[1].seconds))
+        for (name, depth), stats in rows:
+            lines.append(_format_row('{} {}'.format(depth, name), stats))
+
+        if self.workers:
+            lines.append('')
+            lines.append('{:<30}{:>10}{:>12}'.format('worker', 'tasks', 'ms'))
+            for pid, timings in sorted(self.workers.items()):
+                lines.append('{:<30}{:>10}{:>12.3f}'.format(
+                    pid, len(timings), sum(timings) * 1000))
+        return '\n'.join(lines)
+
+    def folded(self):
+        """
+        The time spent in every stack, in the folded format
+        read by flame graph tools: the function names from
+        the outermost in, separated by semicolons, and the
+        number of microseconds.
+
+        :rtype str
+        """
+        return '\n'.join(
+            '{} {}'.format(stack, round(seconds * 1e6))
+            for stack, seconds in sorted(self.stacks.items())
+            if round(seconds * 1e6) > 0)
+
+    def write_folded(self, path):
+        """
+        Writes the folded stacks to a file.
+
+        :param path: str
+        """
+        with open(path, 'w') as f:
+            f.write(self.folded() + '\n')
+
+
+def _count_digits(args):
+    """
+    Counts the digits in the numbers among the arguments
+    of a call.
+
+    :param args: tuple
+    :rtype int
+    """
+    digits = 0
+    for arg in args:
+        if isinstance(arg, list):
+            digits += len(arg)
+        elif isinstance(arg, LimbNumber):
+            digits += len(arg) * arg.digits_per_limb
+    return digits
+
+
+def _format_row(label, stats):
+    return '{:<30}{:>10}{:>12}{:>12}{:>12.3f}'.format(
+        label, stats.calls, stats.digits, stats.blocks, stats.seconds * 1000)
+
+
+if __name__ == '__main__':
+    import karatsuba
+    from karatsuba import multiply_karatsuba
+    from parallel_karatsuba import multiply_karatsuba_parallel
+    from big_numbers import big_number_as_array
+
+    print('testing Profiler')
+    original = karatsuba.multiply_karatsuba
+    with Profiler() as profiler:
+        assert karatsuba.multiply_karatsuba([2, 4, 5],
+                                            [6, 7]) == [1, 6, 4, 1, 5]
+    assert karatsuba.multiply_karatsuba is original
+    functions = profiler.by_function()
+    assert functions['multiply_karatsuba'].calls == 16
+    # the base case is reached through the default argument
+    assert functions['multiply_simple'].calls == 9
+    depths = profiler.by_depth()
+    assert depths['multiply_karatsuba', 0].calls == 1
+    assert depths['multiply_karatsuba', 0].digits == 5
+    assert depths['multiply_karatsuba', 1].calls == 3
+    assert depths['multiply_karatsuba', 2].calls == 6
+    assert 'multiply_karatsuba;multiply_karatsuba;add' in profiler.stacks
+    assert profiler.folded().startswith('multiply_karatsuba')
+
+    with Profiler() as profiler:
+        multiply_karatsuba_parallel(big_number_as_array[:400],
+                                    big_number_as_array[:400], workers=2)
+    assert sum(map(len, profiler.workers.values())) == 3
+
+    import time
+    x = big_number_as_array[:300]
+    start = time.time()
+    multiply_karatsuba(x, x[::-1])
+    end = time.time()
+    print('karatsuba', (end - start) * 1000, 'milliseconds')
+    with Profiler() as profiler:
+        start = time.time()
+        multiply_karatsuba(x, x[::-1])
+        end = time.time()
+    print('karatsuba, profiled', (end - start) * 1000, 'milliseconds')
+    print(profiler.report())
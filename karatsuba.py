@@ -7,44 +7,176 @@ algorithm has O(n*log n) time complexity and
 O(n) space complexity.
 """
 
-from util import add, carry_left, match_padding, pad, split, subtract
-from grade_school import multiply_simple
-from big_numbers import big_number, big_number_as_array
+from util import add, add_signed, carry_left, match_padding, pad, signed, split, strip_leading_zeros, subtract, subtract_signed
+from grade_school import multiply_simple, multiply_simple_limbs, square_simple
+from limbs import LimbNumber, add_limbs, shift_limbs, split_limbs, subtract_limbs
+from convert import int_adapter
 
+# below this many limbs, grade school beats the limb recursion
+LIMB_THRESHOLD = 32
 
-def multiply_karatsuba(x, y):
+
+def multiply_karatsuba(x, y, threshold=1, base=multiply_simple):
     """
     Multiplies two numbers represented as arrays
     using the Karatsuba algorithm, falling back
-    on grade school algorithm for the base case
+    on grade school algorithm for the base case.
+    A different base case algorithm can be given
+    as `base`, to be used once the numbers are no
+    longer than `threshold` digits.
 
-    :param x: []int
-    :param y: []int
-    :rtype []int
+    :param x: []int|LimbNumber
+    :param y: []int|LimbNumber
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype []int|LimbNumber
     """
+    if isinstance(x, LimbNumber):
+        return multiply_karatsuba_limbs(x, y)
+
     x, y = match_padding(x, y)
+
+    # squares have their own, cheaper, recursion
+    if x == y:
+        return square_karatsuba(x, threshold, base)
+
     a, b = split(x)
     c, d = split(y)
 
-    if len(x) == 1:
-        return multiply_simple(x, y)
+    if len(x) <= threshold:
+        return base(x, y)
 
-    res_1 = multiply_karatsuba(a, c)
-    res_2 = multiply_karatsuba(b, d)
+    res_1 = multiply_karatsuba(a, c, threshold, base)
+    res_2 = multiply_karatsuba(b, d, threshold, base)
 
-    partial = multiply_karatsuba(add(a, b), add(c, d))
+    partial = multiply_karatsuba(add(a, b), add(c, d), threshold, base)
     # res_3 is partial - res_1 - res_2.
     # To simplify, just add res_1 and res_2 then subtract that sum from partial
     res_3 = subtract(partial, add(res_1, res_2))
 
+    # the lower halves b and d hold the extra digit for odd lengths,
+    # so shift by the width of the lower half rather than by len(x)
+    shift = len(b)
     res = add(
-        pad(res_1, len(x), 'right'), res_2,
-        pad(res_3, (len(x) + 1) // 2, 'right'))
+        pad(res_1, 2 * shift, 'right'), res_2,
+        pad(res_3, shift, 'right'))
 
     return res
 
 
+def square_karatsuba(x, threshold=1, base=multiply_simple):
+    """
+    Squares a number represented as an array using
+    the Karatsuba algorithm. With both numbers the
+    same, all three of the sub-products are squares
+    too, so the recursion only ever squares. The
+    base case squares using `base`, or square_simple
+    if base is the default multiply_simple.
+
+    :param x: []int
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype []int
+    """
+    if len(x) <= threshold:
+        return square_simple(x) if base is multiply_simple else base(x, x)
+
+    a, b = split(x)
+    res_1 = square_karatsuba(a, threshold, base)
+    res_2 = square_karatsuba(b, threshold, base)
+    partial = square_karatsuba(add(a, b), threshold, base)
+    res_3 = subtract(partial, add(res_1, res_2))
+
+    shift = len(b)
+    return add(
+        pad(res_1, 2 * shift, 'right'), res_2,
+        pad(res_3, shift, 'right'))
+
+
+def multiply_karatsuba_subtractive(x, y, threshold=1, base=multiply_simple):
+    """
+    Multiplies two numbers represented as arrays
+    using the subtractive form of the Karatsuba
+    algorithm. The middle term is worked out as
+    ac + bd + (a - b)(d - c) rather than as
+    (a + b)(c + d) - ac - bd, so there is no carry
+    digit to widen the third sub-product and all
+    three stay at half the width of x. Squares go
+    to square_karatsuba, as in multiply_karatsuba.
+
+    :param x: []int
+    :param y: []int
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype []int
+    """
+    x, y = match_padding(x, y)
+
+    # squares have their own, cheaper, recursion
+    if x == y:
+        return square_karatsuba(x, threshold, base)
+
+    if len(x) <= threshold:
+        return base(x, y)
+
+    a, b = split(x)
+    c, d = split(y)
+
+    res_1 = multiply_karatsuba_subtractive(a, c, threshold, base)
+    res_2 = multiply_karatsuba_subtractive(b, d, threshold, base)
+
+    # the differences can be negative, so multiply the
+    # magnitudes and work out the sign separately
+    diff_1 = subtract_signed(signed(a), signed(b))
+    diff_2 = subtract_signed(signed(d), signed(c))
+    partial = signed(
+        multiply_karatsuba_subtractive(diff_1.digits, diff_2.digits,
+                                       threshold, base),
+        diff_1.sign * diff_2.sign)
+    # the middle term ad + bc can't be negative
+    res_3 = add_signed(signed(add(res_1, res_2)), partial).digits
+
+    shift = len(b)
+    return add(
+        pad(res_1, 2 * shift, 'right'), res_2,
+        pad(res_3, shift, 'right'))
+
+
+def multiply_karatsuba_limbs(x, y):
+    """
+    Multiplies two numbers represented as limbs
+    using the Karatsuba algorithm, falling back
+    on grade school algorithm below LIMB_THRESHOLD
+    limbs.
+
+    :param x: LimbNumber
+    :param y: LimbNumber
+    :rtype LimbNumber
+    """
+    length = max(len(x), len(y))
+    if length <= LIMB_THRESHOLD:
+        return multiply_simple_limbs(x, y)
+
+    # as with split, the lower half gets the extra limb for odd lengths
+    shift = length - length // 2
+    a, b = split_limbs(x, shift)
+    c, d = split_limbs(y, shift)
+
+    res_1 = multiply_karatsuba_limbs(a, c)
+    res_2 = multiply_karatsuba_limbs(b, d)
+    partial = multiply_karatsuba_limbs(add_limbs(a, b), add_limbs(c, d))
+    res_3 = subtract_limbs(partial, add_limbs(res_1, res_2))
+
+    return add_limbs(
+        shift_limbs(res_1, 2 * shift), res_2, shift_limbs(res_3, shift))
+
+
+# the same algorithm, taking and returning Python ints
+multiply_karatsuba_int = int_adapter(multiply_karatsuba)
+
+
 if __name__ == '__main__':
+    from big_numbers import big_number, big_number_as_array
 
     print('testing karatsuba')
     assert multiply_karatsuba([0], [0]) == [0]
@@ -54,6 +186,73 @@ if __name__ == '__main__':
     assert multiply_karatsuba([2, 0], [3, 0]) == [6, 0, 0]
     assert multiply_karatsuba([2, 4], [3, 5]) == [8, 4, 0]
     assert multiply_karatsuba([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_karatsuba([1, 2, 3], [4, 5, 6]) == [5, 6, 0, 8, 8]
+
+    print('testing square_karatsuba')
+    assert square_karatsuba([0]) == [0]
+    assert square_karatsuba([9, 9, 9]) == [9, 9, 8, 0, 0, 1]
+    assert strip_leading_zeros(square_karatsuba(
+        big_number_as_array[:300])) == list(
+            map(int, str(int(''.join(map(str, big_number_as_array[:300])))**2)))
+
+    print('testing karatsuba subtractive')
+    assert multiply_karatsuba_subtractive([0], [0]) == [0]
+    assert strip_leading_zeros(multiply_karatsuba_subtractive(
+        [2, 4, 5], [6, 7])) == [1, 6, 4, 1, 5]
+    assert strip_leading_zeros(multiply_karatsuba_subtractive(
+        [9, 9, 9], [1, 0, 0, 1])) == [9, 9, 9, 9, 9, 9]
+    assert strip_leading_zeros(multiply_karatsuba_subtractive(
+        big_number_as_array, big_number_as_array)) == strip_leading_zeros(
+            multiply_karatsuba(big_number_as_array, big_number_as_array))
+    assert strip_leading_zeros(multiply_karatsuba_subtractive(
+        big_number_as_array,
+        big_number_as_array[::-1])) == strip_leading_zeros(
+            multiply_karatsuba(big_number_as_array, big_number_as_array[::-1]))
+
+    print('testing karatsuba limbs')
+    limb_number = LimbNumber.from_digits(big_number_as_array)
+    assert multiply_karatsuba(LimbNumber.from_digits([2, 4, 5], 1),
+                              LimbNumber.from_digits([6, 7], 1)).to_digits(
+                              ) == [1, 6, 4, 1, 5]
+    assert multiply_karatsuba(
+        LimbNumber.from_digits(big_number_as_array, 1),
+        LimbNumber.from_digits(big_number_as_array, 1)) == multiply_karatsuba(
+            limb_number, limb_number)
+
+    def measure(name, x, y):
+        """
+        Counts the calls, the digits they were given and the
+        deepest level of recursion for one multiplication, by
+        temporarily wrapping the recursive function.
+        """
+        func = globals()[name]
+        stats = {'calls': 0, 'digits': 0, 'depth': 0}
+        level = [0]
+
+        def counted(x, y, *args):
+            stats['calls'] += 1
+            stats['digits'] += max(len(x), len(y))
+            level[0] += 1
+            stats['depth'] = max(stats['depth'], level[0])
+            try:
+                return func(x, y, *args)
+            finally:
+                level[0] -= 1
+
+        globals()[name] = counted
+        try:
+            counted(x, y)
+        finally:
+            globals()[name] = func
+        return stats
+
+    # use two different numbers so that squaring doesn't kick in
+    other = big_number_as_array[::-1]
+    print('karatsuba', measure('multiply_karatsuba', big_number_as_array,
+                               other))
+    print('karatsuba subtractive',
+          measure('multiply_karatsuba_subtractive', big_number_as_array,
+                  other))
 
     import time
     start = time.time()
@@ -61,6 +260,19 @@ if __name__ == '__main__':
     end = time.time()
     print('karatsuba', (end - start) * 1000, 'milliseconds')
     start = time.time()
+    multiply_karatsuba(big_number_as_array, other)
+    end = time.time()
+    print('karatsuba without squaring (additive)', (end - start) * 1000,
+          'milliseconds')
+    start = time.time()
+    multiply_karatsuba_subtractive(big_number_as_array, other)
+    end = time.time()
+    print('karatsuba subtractive', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    multiply_karatsuba(limb_number, limb_number)
+    end = time.time()
+    print('karatsuba limbs', (end - start) * 1000, 'milliseconds')
+    start = time.time()
     big_number * big_number
     end = time.time()
     print('native', (end - start) * 1000, 'milliseconds')
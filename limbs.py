@@ -0,0 +1,243 @@
+"""
+This module implements a compact representation of
+big numbers as arrays of multi-digit limbs, along
+with the primitive arithmetic that the multiplication
+algorithms need to run on it.
+
+Rather than a Python list holding one decimal digit
+per element, a LimbNumber packs k decimal digits
+into each limb (so the base is 10^k) and stores the
+limbs in an array.array of machine integers, least
+significant limb first. That's 4 bytes per k digits
+instead of a list slot and int object per digit, and
+one loop iteration per limb instead of per digit.
+"""
+
+from array import array
+
+# 10^9 is the biggest power of ten that fits in an unsigned 32 bit limb
+DEFAULT_DIGITS_PER_LIMB = 9
+MAX_DIGITS_PER_LIMB = 9
+TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
+
+
+class LimbNumber:
+    """
+    A non-negative number stored as base 10^k limbs,
+    least significant limb first, with no leading
+    (most significant) zero limbs except for zero itself.
+    """
+    __slots__ = ('limbs', 'digits_per_limb')
+
+    def __init__(self, limbs, digits_per_limb=DEFAULT_DIGITS_PER_LIMB):
+        """
+        :param limbs: array|[]int, least significant limb first
+        :param digits_per_limb: int
+        """
+        if not 1 <= digits_per_limb <= MAX_DIGITS_PER_LIMB:
+            raise ValueError(
+                'digits_per_limb must be between 1 and {}'.format(
+                    MAX_DIGITS_PER_LIMB))
+        self.limbs = trim(array(TYPECODE, limbs))
+        self.digits_per_limb = digits_per_limb
+
+    @property
+    def base(self):
+        return 10**self.digits_per_limb
+
+    @classmethod
+    def from_digits(cls, digits, digits_per_limb=DEFAULT_DIGITS_PER_LIMB):
+        """
+        Packs a number expressed as an array of decimal
+        digits, most significant first, into limbs.
+
+        :param digits: []int
+        :param digits_per_limb: int
+        :rtype LimbNumber
+        """
+        limbs = array(TYPECODE)
+        # walk from the least significant end, k digits at a time
+        end = len(digits)
+        while end > 0:
+            start = max(0, end - digits_per_limb)
+            value = 0
+            for digit in digits[start:end]:
+                value = value * 10 + digit
+            limbs.append(value)
+            end = start
+        return cls(limbs, digits_per_limb)
+
+    def to_digits(self):
+        """
+        Unpacks the limbs into an array of decimal
+        digits, most significant first.
+
+        :rtype []int
+        """
+        digits = []
+        for limb in reversed(self.limbs):
+            chunk = [0] * self.digits_per_limb
+            for i in range(self.digits_per_limb - 1, -1, -1):
+                limb, chunk[i] = divmod(limb, 10)
+            digits.extend(chunk)
+        # only the top limb can have leading zeros
+        i = 0
+        while i < len(digits) - 1 and digits[i] == 0:
+            i += 1
+        return digits[i:]
+
+    def __len__(self):
+        return len(self.limbs)
+
+    def __eq__(self, other):
+        if not isinstance(other, LimbNumber):
+            return NotImplemented
+        if self.digits_per_limb == other.digits_per_limb:
+            return self.limbs == other.limbs
+        return self.to_digits() == other.to_digits()
+
+    def __repr__(self):
+        return 'LimbNumber({})'.format(''.join(map(str, self.to_digits())))
+
+
+def trim(limbs):
+    """
+    Removes leading (most significant) zero limbs,
+    keeping a single zero limb for the number zero.
+
+    :param limbs: array
+    :rtype array
+    """
+    end = len(limbs)
+    while end > 1 and limbs[end - 1] == 0:
+        end -= 1
+    if end == 0:
+        return array(TYPECODE, [0])
+    return limbs if end == len(limbs) else limbs[:end]
+
+
+def check_compatible(*args):
+    """
+    Makes sure that all the numbers use the same base,
+    returning the number of digits per limb they share.
+
+    :param args: *LimbNumber
+    :rtype int
+    """
+    digits_per_limb = args[0].digits_per_limb
+    for num in args[1:]:
+        if num.digits_per_limb != digits_per_limb:
+            raise ValueError('cannot mix limb sizes {} and {}'.format(
+                digits_per_limb, num.digits_per_limb))
+    return digits_per_limb
+
+
+def add_limbs(*args):
+    """
+    Adds an arbitrary number of numbers represented
+    as limbs, carrying into the next limb whenever
+    a column overflows the base.
+
+    :param args: *LimbNumber
+    :rtype LimbNumber
+    """
+    digits_per_limb = check_compatible(*args)
+    base = 10**digits_per_limb
+    length = max(len(num) for num in args)
+    res = array(TYPECODE, bytes(array(TYPECODE).itemsize * (length + 1)))
+    carry = 0
+    for i in range(length):
+        column = carry
+        for num in args:
+            if i < len(num.limbs):
+                column += num.limbs[i]
+        carry, res[i] = divmod(column, base)
+    res[length] = carry
+    return LimbNumber(res, digits_per_limb)
+
+
+def subtract_limbs(x, y):
+    """
+    Subtracts a number y from another number x where
+    both numbers are represented as limbs. As with
+    util.subtract, x must be at least as large as y.
+
+    :param x: LimbNumber
+    :param y: LimbNumber
+    :rtype LimbNumber
+    """
+    digits_per_limb = check_compatible(x, y)
+    base = 10**digits_per_limb
+    res = array(TYPECODE, x.limbs)
+    borrow = 0
+    for i in range(len(res)):
+        sub = res[i] - borrow - (y.limbs[i] if i < len(y.limbs) else 0)
+        if sub < 0:
+            sub += base
+            borrow = 1
+        else:
+            borrow = 0
+        res[i] = sub
+    if borrow:
+        raise ValueError('subtract_limbs cannot produce negative results')
+    return LimbNumber(res, digits_per_limb)
+
+
+def shift_limbs(num, places):
+    """
+    Multiplies a number by base^places by prepending
+    zero limbs at the least significant end.
+
+    :param num: LimbNumber
+    :param places: int
+    :rtype LimbNumber
+    """
+    if places == 0 or num.limbs == array(TYPECODE, [0]):
+        return num
+    return LimbNumber(
+        array(TYPECODE, bytes(num.limbs.itemsize * places)) + num.limbs,
+        num.digits_per_limb)
+
+
+def split_limbs(num, places):
+    """
+    Splits a number into its high and low parts, where
+    the low part holds the bottom `places` limbs, so that
+    num = high * base^places + low.
+
+    :param num: LimbNumber
+    :param places: int
+    :rtype LimbNumber LimbNumber
+    """
+    return (LimbNumber(num.limbs[places:], num.digits_per_limb),
+            LimbNumber(num.limbs[:places], num.digits_per_limb))
+
+
+if __name__ == '__main__':
+
+    print('testing from_digits and to_digits')
+    assert LimbNumber.from_digits([0]).to_digits() == [0]
+    assert LimbNumber.from_digits([0, 0, 1, 2]).to_digits() == [1, 2]
+    assert LimbNumber.from_digits([1, 2, 3, 4, 5], 2).limbs == array(
+        TYPECODE, [45, 23, 1])
+    assert LimbNumber.from_digits([1, 0, 0, 0, 5], 2).to_digits() == [
+        1, 0, 0, 0, 5]
+
+    print('testing add_limbs')
+    assert add_limbs(LimbNumber.from_digits([9, 9], 1),
+                     LimbNumber.from_digits([1], 1)).to_digits() == [1, 0, 0]
+    assert add_limbs(*[LimbNumber.from_digits([9, 9, 9], 2)] * 3).to_digits(
+    ) == [2, 9, 9, 7]
+
+    print('testing subtract_limbs')
+    assert subtract_limbs(LimbNumber.from_digits([1, 0, 0, 0], 2),
+                          LimbNumber.from_digits([1], 2)).to_digits() == [
+                              9, 9, 9]
+    assert subtract_limbs(LimbNumber.from_digits([5]),
+                          LimbNumber.from_digits([5])).to_digits() == [0]
+
+    print('testing shift_limbs and split_limbs')
+    assert shift_limbs(LimbNumber.from_digits([1, 2], 1), 2).to_digits() == [
+        1, 2, 0, 0]
+    high, low = split_limbs(LimbNumber.from_digits([1, 2, 0, 3], 1), 2)
+    assert (high.to_digits(), low.to_digits()) == ([1, 2], [3])
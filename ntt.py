@@ -0,0 +1,253 @@
+"""
+This module implements integer multiplication
+using the number theoretic transform (NTT), the
+exact modular analogue of the fast Fourier transform.
+The algorithm has O(n*log n) time complexity and
+O(n) space complexity.
+
+The digits are packed into limbs of k digits, and the
+limbs are convolved by transforming them modulo three
+NTT-friendly primes, multiplying pointwise and
+transforming back. The three residues of each column
+are combined with the Chinese remainder theorem to
+recover the exact column sums, and then the carries
+are resolved. k is picked automatically so that
+every column sum fits in 64 bits, which keeps all of
+the arithmetic inside NumPy exact.
+"""
+
+import numpy as np
+
+from util import strip_leading_zeros
+
+# primes of the form c * 2^m + 1, each with a primitive root.
+# They are all below 2^30, so the product of two residues fits in 64 bits.
+PRIMES = ((998244353, 3), (167772161, 3), (469762049, 3))
+# the largest power of two dividing every p - 1 bounds the transform length
+MAX_TRANSFORM_LENGTH = 1 << 23
+# column sums must stay below this to be recovered exactly in int64
+MAX_COLUMN = 2**63 - 1
+MAX_DIGITS_PER_LIMB = 6
+
+
+def multiply_ntt(x, y):
+    """
+    Multiplies two numbers represented as arrays
+    using the number theoretic transform.
+
+    :param x: []int
+    :param y: []int
+    :rtype []int
+    """
+    digits_per_limb, length = _choose_limbs(len(x), len(y))
+    a = _to_limbs(x, digits_per_limb)
+    b = _to_limbs(y, digits_per_limb)
+    # squaring only needs one forward transform per prime
+    square = x == y
+
+    residues = []
+    for prime, root in PRIMES:
+        fa = _transform(_extend(a, length), prime, root)
+        fb = fa if square else _transform(_extend(b, length), prime, root)
+        residues.append(
+            _transform(fa * fb % prime, prime, root, inverse=True))
+    columns = _combine_residues(residues)[:len(a) + len(b) - 1]
+
+    return _from_limbs(_carry(columns.tolist(), 10**digits_per_limb),
+                       digits_per_limb)
+
+
+def _choose_limbs(x_length, y_length):
+    """
+    Picks the largest number of digits per limb for which
+    every column sum of the limb convolution fits in 64 bits,
+    along with the transform length that needs.
+
+    :param x_length: int
+    :param y_length: int
+    :rtype int int
+    """
+    for digits_per_limb in range(MAX_DIGITS_PER_LIMB, 0, -1):
+        x_limbs = -(-x_length // digits_per_limb)
+        y_limbs = -(-y_length // digits_per_limb)
+        length = 1
+        while length < x_limbs + y_limbs - 1:
+            length *= 2
+        largest = min(x_limbs, y_limbs) * (10**digits_per_limb - 1)**2
+        if largest <= MAX_COLUMN and length <= MAX_TRANSFORM_LENGTH:
+            return digits_per_limb, length
+    raise ValueError('operands are too large for multiply_ntt')
+
+
+def _to_limbs(num, digits_per_limb):
+    """
+    Packs an array of digits, most significant first, into
+    an int64 array of limbs, least significant first.
+
+    :param num: []int
+    :param digits_per_limb: int
+    :rtype np.ndarray
+    """
+    digits = np.asarray(num, dtype=np.int64)
+    padding = -len(digits) % digits_per_limb
+    digits = np.concatenate((np.zeros(padding, dtype=np.int64), digits))
+    powers = 10**np.arange(digits_per_limb - 1, -1, -1, dtype=np.int64)
+    return (digits.reshape(-1, digits_per_limb) @ powers)[::-1].copy()
+
+
+def _from_limbs(limbs, digits_per_limb):
+    """
+    Unpacks limbs, least significant first, into an
+    array of digits, most significant first.
+
+    :param limbs: []int
+    :param digits_per_limb: int
+    :rtype []int
+    """
+    limbs = np.asarray(limbs[::-1], dtype=np.int64)
+    powers = 10**np.arange(digits_per_limb - 1, -1, -1, dtype=np.int64)
+    digits = (limbs[:, None] // powers) % 10
+    return strip_leading_zeros(digits.reshape(-1).tolist())
+
+
+def _extend(limbs, length):
+    """
+    Pads limbs with zeros at the most significant end
+    up to the transform length.
+
+    :param limbs: np.ndarray
+    :param length: int
+    :rtype np.ndarray
+    """
+    res = np.zeros(length, dtype=np.int64)
+    res[:len(limbs)] = limbs
+    return res
+
+
+def _powers(base, count, prime):
+    """
+    Returns [1, base, base^2, ..., base^(count - 1)] mod prime.
+
+    :param base: int
+    :param count: int
+    :param prime: int
+    :rtype np.ndarray
+    """
+    res = np.ones(1, dtype=np.int64)
+    while len(res) < count:
+        step = pow(base, len(res), prime)
+        res = np.concatenate((res, res * step % prime))
+    return res[:count]
+
+
+def _bit_reverse(length):
+    """
+    Returns the bit reversal permutation of range(length),
+    where length is a power of two.
+
+    :param length: int
+    :rtype np.ndarray
+    """
+    res = np.zeros(length, dtype=np.int64)
+    bits = length.bit_length() - 1
+    indices = np.arange(length, dtype=np.int64)
+    for bit in range(bits):
+        res |= ((indices >> bit) & 1) << (bits - 1 - bit)
+    return res
+
+
+def _transform(values, prime, root, inverse=False):
+    """
+    Computes the number theoretic transform of values
+    modulo prime, using an iterative radix-2 Cooley-Tukey
+    transform with each butterfly stage vectorized.
+
+    :param values: np.ndarray
+    :param prime: int
+    :param root: int
+    :param inverse: bool
+    :rtype np.ndarray
+    """
+    length = len(values)
+    res = values[_bit_reverse(length)]
+    size = 2
+    while size <= length:
+        half = size // 2
+        w = pow(root, (prime - 1) // size, prime)
+        if inverse:
+            w = pow(w, prime - 2, prime)
+        twiddles = _powers(w, half, prime)
+        blocks = res.reshape(-1, size)
+        u = blocks[:, :half]
+        v = blocks[:, half:] * twiddles % prime
+        res = np.concatenate(((u + v) % prime, (u - v) % prime), axis=1)
+        res = res.reshape(-1)
+        size *= 2
+    if inverse:
+        res = res * pow(length, prime - 2, prime) % prime
+    return res
+
+
+def _combine_residues(residues):
+    """
+    Recovers the column sums from their residues modulo each
+    of the primes with Garner's algorithm. The result is exact
+    as long as every column sum is below MAX_COLUMN.
+
+    :param residues: []np.ndarray
+    :rtype np.ndarray
+    """
+    (p_1, _), (p_2, _), (p_3, _) = PRIMES
+    r_1, r_2, r_3 = residues
+    t_2 = (r_2 - r_1) % p_2 * pow(p_1, -1, p_2) % p_2
+    partial = r_1 + p_1 * t_2
+    t_3 = (r_3 - partial) % p_3 * pow(p_1 * p_2, -1, p_3) % p_3
+    # every term is no bigger than the column sum, so nothing overflows
+    return partial + (p_1 * p_2) * t_3
+
+
+def _carry(columns, base):
+    """
+    Resolves the carries in column sums, least significant
+    first, so that every limb is below base.
+
+    :param columns: []int
+    :param base: int
+    :rtype []int
+    """
+    res = [0] * (len(columns) + 1)
+    carry = 0
+    for i in range(len(columns)):
+        carry, res[i] = divmod(columns[i] + carry, base)
+    res[len(columns)] = carry
+    return res
+
+
+if __name__ == '__main__':
+    import random
+    from convolution import multiply_convolution
+    from big_numbers import big_number_as_array
+
+    print('testing multiply_ntt')
+    assert multiply_ntt([0], [0]) == [0]
+    assert multiply_ntt([1], [0]) == [0]
+    assert multiply_ntt([1], [1]) == [1]
+    assert multiply_ntt([2, 0], [3, 0]) == [6, 0, 0]
+    assert multiply_ntt([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_ntt([9] * 20, [9] * 7) == multiply_convolution([9] * 20,
+                                                                   [9] * 7)
+    for length in [1, 13, 500, 4097]:
+        x = [random.randint(0, 9) for _ in range(length)]
+        y = [random.randint(0, 9) for _ in range(length // 2 + 1)]
+        assert multiply_ntt(x, y) == multiply_convolution(x, y)
+    assert multiply_ntt(
+        big_number_as_array, big_number_as_array) == multiply_convolution(
+            big_number_as_array, big_number_as_array)
+
+    import time
+    for length in [1800, 100000, 1000000]:
+        x = [random.randint(0, 9) for _ in range(length)]
+        start = time.time()
+        multiply_ntt(x, x)
+        end = time.time()
+        print(length, 'digits ntt', (end - start) * 1000, 'milliseconds')
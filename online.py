@@ -0,0 +1,152 @@
+"""
+This module implements online multiplication: the
+digits of the numbers are consumed one at a time,
+least significant first, and the digits of the
+product are yielded as soon as they are final.
+
+Digit k of the product only depends on digits 0 to k
+of each number and on the carry out of digit k - 1,
+since every later pairwise product lands further to
+the left. So as soon as the k-th digit of both numbers
+has arrived, column k can be summed, the carry added,
+and the digit yielded; nothing that comes later can
+change it. The only state carried between columns is
+a single int, which stays below 9 * (k + 1) and so has
+O(log k) digits.
+
+This lets a consumer that only needs the low digits,
+such as a checksum or a residue mod 10^k, start work
+before the product is done, or stop after k digits
+without the rest ever being computed.
+"""
+
+import itertools
+import operator
+
+from util import strip_leading_zeros
+
+
+def multiply_online(x, y):
+    """
+    Multiplies two numbers given as iterables of digits,
+    least significant digit first, yielding the digits
+    of the product least significant first as soon as
+    they are known. The product is not stripped of
+    leading zeros, since the generator can't tell that
+    a zero is leading until the inputs run out.
+
+    :param x: iterable of int
+    :param y: iterable of int
+    :rtype iterator of int
+    """
+    x = iter(x)
+    y = iter(y)
+    # the digits seen so far, least significant first
+    xs = []
+    ys = []
+    x_done = y_done = False
+    carry = 0
+    k = 0
+    while True:
+        if not x_done:
+            digit = next(x, None)
+            if digit is None:
+                x_done = True
+            else:
+                xs.append(digit)
+        if not y_done:
+            digit = next(y, None)
+            if digit is None:
+                y_done = True
+            else:
+                ys.append(digit)
+        if x_done and y_done and k >= len(xs) + len(ys) - 1:
+            break
+        # column k is the sum of xs[i] * ys[k - i] over the valid i
+        low = max(0, k - len(ys) + 1)
+        high = min(k, len(xs) - 1)
+        if low <= high:
+            column = sum(
+                map(operator.mul, xs[low:high + 1],
+                    ys[k - high:k - low + 1][::-1]))
+        else:
+            column = 0
+        carry, digit = divmod(column + carry, 10)
+        yield digit
+        k += 1
+
+    # flush whatever is left in the carry
+    while carry:
+        carry, digit = divmod(carry, 10)
+        yield digit
+
+
+def multiply_low(x, y, k):
+    """
+    Returns the last k digits of the product of two
+    numbers represented as arrays, i.e. the product
+    mod 10^k, reading no more than the last k digits
+    of either number.
+
+    :param x: []int
+    :param y: []int
+    :param k: int
+    :rtype []int
+    """
+    digits = list(
+        itertools.islice(multiply_online(reversed(x), reversed(y)), k))
+    digits.reverse()
+    return strip_leading_zeros(digits)
+
+
+if __name__ == '__main__':
+    import random
+    from convolution import multiply_convolution
+    from big_numbers import big_number_as_array
+
+    def multiply(x, y):
+        return strip_leading_zeros(
+            list(multiply_online(reversed(x), reversed(y)))[::-1])
+
+    print('testing multiply_online')
+    assert multiply([0], [0]) == [0]
+    assert multiply([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply([6, 7], [2, 4, 5]) == [1, 6, 4, 1, 5]
+    assert multiply([9] * 7,
+                    [9] * 5) == [9] * 4 + [8] + [9] * 2 + [0] * 4 + [1]
+    assert multiply(big_number_as_array,
+                    big_number_as_array) == multiply_convolution(
+                        big_number_as_array, big_number_as_array)
+
+    # the digits are yielded before the inputs have been read in full
+    read = []
+
+    def tracked(num):
+        for digit in reversed(num):
+            read.append(digit)
+            yield digit
+
+    product = multiply_online(tracked([1, 2, 3, 4]), iter([5, 6, 7, 8][::-1]))
+    assert next(product) == 2 and read == [4]
+
+    print('testing multiply_low')
+    assert multiply_low([2, 4, 5], [6, 7], 2) == [1, 5]
+    assert multiply_low([2, 4, 5], [6, 7], 10) == [1, 6, 4, 1, 5]
+    assert multiply_low([1, 0, 0], [3], 2) == [0]
+    for _ in range(20):
+        x = [random.randint(0, 9) for _ in range(random.randint(1, 60))]
+        y = [random.randint(0, 9) for _ in range(random.randint(1, 60))]
+        k = random.randint(1, 130)
+        expected = multiply_convolution(x, y)
+        assert multiply_low(x, y, k) == strip_leading_zeros(expected[-k:])
+
+    import time
+    start = time.time()
+    multiply_low(big_number_as_array, big_number_as_array, 20)
+    end = time.time()
+    print('multiply_low, last 20 digits', (end - start) * 1000,
+          'milliseconds')
+    start = time.time()
+    multiply(big_number_as_array, big_number_as_array)
+    end = time.time()
+    print('multiply_online, all digits', (end - start) * 1000, 'milliseconds')
@@ -0,0 +1,255 @@
+"""
+This module implements multiplication of numbers
+that live in files rather than in memory, for when
+the numbers are too big to hold comfortably as
+lists of ints.
+
+Numbers are stored in a compact binary format: a
+12 byte header made up of the magic bytes b'PMDG'
+and the number of digits as a little-endian
+unsigned 64 bit int, followed by the digits, one
+byte each, most significant first. The files are
+opened with mmap, so only the parts being worked on
+need to be paged in.
+
+Multiplication proceeds block by block, like the
+grade school algorithm with blocks for digits: each
+block of x is multiplied in memory by each block of
+y, and the product is added into the memory-mapped
+result file at the right offset. The block size is
+picked so that the blocks and their product fit in
+a given memory budget, however big the numbers are.
+"""
+
+import mmap
+import os
+import struct
+
+from dispatcher import multiply
+
+MAGIC = b'PMDG'
+HEADER = struct.Struct('<4sQ')
+# a rough upper bound on the working memory an engine needs per digit,
+# counting the list slots for its inputs, output and intermediates
+BYTES_PER_DIGIT = 64
+DEFAULT_MEMORY_BUDGET = 64 * 2**20
+
+
+class DigitFile:
+    """
+    A number stored in a file in the digit format,
+    opened with mmap. Use it as a context manager.
+    """
+    __slots__ = ('path', 'writable', 'file', 'map', 'length')
+
+    def __init__(self, path, writable=False):
+        """
+        :param path: str
+        :param writable: bool
+        """
+        self.path = path
+        self.writable = writable
+        self.file = None
+        self.map = None
+        self.length = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'r+b' if self.writable else 'rb')
+        self.map = mmap.mmap(
+            self.file.fileno(), 0,
+            access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        magic, self.length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('{} is not a digit file'.format(self.path))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def read(self, start, stop):
+        """
+        Reads the digits from index start up to stop,
+        counting from the most significant digit.
+
+        :param start: int
+        :param stop: int
+        :rtype []int
+        """
+        return list(self.map[HEADER.size + start:HEADER.size + stop])
+
+    def add_at(self, num, shift):
+        """
+        Adds num * 10^shift into the number in place,
+        carrying as far to the left as it needs to.
+
+        :param num: []int
+        :param shift: int
+        """
+        # the slots that num lines up with, most significant first
+        end = HEADER.size + self.length - shift
+        start = end - len(num)
+        if start < HEADER.size:
+            raise ValueError('the sum does not fit in the file')
+        window = list(self.map[start:end])
+        carry = 0
+        for i in range(len(num) - 1, -1, -1):
+            carry, window[i] = divmod(window[i] + num[i] + carry, 10)
+        self.map[start:end] = bytes(window)
+        # keep carrying to the left, a byte at a time
+        position = start - 1
+        while carry:
+            if position < HEADER.size:
+                raise ValueError('the sum does not fit in the file')
+            carry, self.map[position] = divmod(self.map[position] + carry, 10)
+            position -= 1
+
+
+def create_digits(path, length):
+    """
+    Creates a digit file holding `length` zeros.
+
+    :param path: str
+    :param length: int
+    """
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, length))
+        # zero fill by extending the file, without writing anything
+        f.truncate(HEADER.size + length)
+
+
+def write_digits(path, num):
+    """
+    Writes a number represented as an array to a digit file.
+
+    :param path: str
+    :param num: []int
+    """
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(num)))
+        f.write(bytes(num))
+
+
+def read_digits(path):
+    """
+    Reads a whole digit file into a number represented as an array.
+
+    :param path: str
+    :rtype []int
+    """
+    with DigitFile(path) as num:
+        return num.read(0, len(num))
+
+
+def block_size(memory_budget):
+    """
+    The number of digits per block such that two blocks
+    and their product fit in the memory budget.
+
+    :param memory_budget: int, in bytes
+    :rtype int
+    """
+    return max(1, memory_budget // (4 * BYTES_PER_DIGIT))
+
+
+def multiply_files(x_path,
+                   y_path,
+                   out_path,
+                   memory_budget=DEFAULT_MEMORY_BUDGET,
+                   engine=multiply):
+    """
+    Multiplies the numbers in two digit files, writing the
+    product to a third. Blocks of the numbers are multiplied
+    in memory using `engine` and accumulated into the
+    memory-mapped result, so that no more than about
+    memory_budget bytes are needed at once.
+
+    :param x_path: str
+    :param y_path: str
+    :param out_path: str
+    :param memory_budget: int, in bytes
+    :param engine: func([]int, []int) []int
+    """
+    size = block_size(memory_budget)
+    with DigitFile(x_path) as x, DigitFile(y_path) as y:
+        length = len(x) + len(y)
+        create_digits(out_path, length)
+        with DigitFile(out_path, writable=True) as out:
+            # walk the blocks from the least significant end
+            for x_shift in range(0, len(x), size):
+                x_block = x.read(max(0, len(x) - x_shift - size),
+                                 len(x) - x_shift)
+                for y_shift in range(0, len(y), size):
+                    y_block = y.read(max(0, len(y) - y_shift - size),
+                                     len(y) - y_shift)
+                    out.add_at(engine(x_block, y_block), x_shift + y_shift)
+            leading = _count_leading_zeros(out)
+            if leading:
+                # slide the digits over the leading zeros
+                out.map.move(HEADER.size, HEADER.size + leading,
+                             length - leading)
+                HEADER.pack_into(out.map, 0, MAGIC, length - leading)
+    if leading:
+        os.truncate(out_path, HEADER.size + length - leading)
+
+
+def _count_leading_zeros(num):
+    """
+    Counts the leading zeros of a digit file, leaving
+    at least one digit.
+
+    :param num: DigitFile
+    :rtype int
+    """
+    count = 0
+    while count < len(num) - 1 and num.map[HEADER.size + count] == 0:
+        count += 1
+    return count
+
+
+if __name__ == '__main__':
+    import random
+    import tempfile
+    from convolution import multiply_convolution
+    from big_numbers import big_number_as_array
+
+    with tempfile.TemporaryDirectory() as directory:
+        x_path = os.path.join(directory, 'x.digits')
+        y_path = os.path.join(directory, 'y.digits')
+        out_path = os.path.join(directory, 'out.digits')
+
+        print('testing write_digits and read_digits')
+        write_digits(x_path, [1, 2, 3])
+        assert read_digits(x_path) == [1, 2, 3]
+        assert os.path.getsize(x_path) == HEADER.size + 3
+
+        print('testing multiply_files')
+        for x, y, budget in [([0], [0], 1), ([2, 4, 5], [6, 7], 1),
+                             ([9] * 10, [9] * 7, 4 * BYTES_PER_DIGIT * 3),
+                             (big_number_as_array, big_number_as_array[:700],
+                              4 * BYTES_PER_DIGIT * 100)]:
+            write_digits(x_path, x)
+            write_digits(y_path, y)
+            multiply_files(x_path, y_path, out_path, budget)
+            assert read_digits(out_path) == multiply_convolution(x, y)
+
+        import time
+        x = [random.randint(0, 9) for _ in range(50000)]
+        write_digits(x_path, x)
+        write_digits(y_path, x)
+        start = time.time()
+        multiply_files(x_path, y_path, out_path, 2**20)
+        end = time.time()
+        print('multiply_files with a 1MB budget', (end - start) * 1000,
+              'milliseconds')
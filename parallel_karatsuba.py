@@ -1,108 +1,338 @@
 """
 This module implements integer multiplication
-using a recursive implementation of the Karatsuba 
-algorithm, falling back to the grade school 
-algorithm for the base case. It implements some 
-parallelization using multiprocessing. The 
-algorithm has O(n*log n) time complexity and 
+using a recursive implementation of the Karatsuba
+algorithm, falling back to the grade school
+algorithm for the base case. It implements some
+parallelization using multiprocessing. The
+algorithm has O(n*log n) time complexity and
 O(n) space complexity.
 
-Runs about 3x faster than regular karatsuba for 
-multiplying two 1800 digit numbers.
-
-Alas, it currently gets the wrong answer, but at least
-it is a deterministically wrong answer...
+The top levels of the recursion tree are unrolled
+in the parent process into a set of independent
+sub-products, which are submitted as tasks to a
+long-lived pool of worker processes. Each worker
+runs the serial Karatsuba algorithm on its task,
+and the parent combines the results. The digits
+themselves travel through shared memory segments,
+so only small descriptors are pickled.
 """
 
-from multiprocessing import Manager, Process
-import random
+import math
+import os
+import time
 
-from util import add, carry_left, match_padding, pad, split, subtract
+from util import add, match_padding, pad, split, strip_leading_zeros, subtract
 from grade_school import multiply_simple
-from big_numbers import big_number, big_number_as_array, big_res
+from karatsuba import multiply_karatsuba, multiply_karatsuba_limbs
+from limbs import LimbNumber, add_limbs, shift_limbs, split_limbs, subtract_limbs
+from convert import int_adapter
+from pool import default_workers, get_pool
+
+# below this many digits, a sub-product isn't worth sending to a worker
+PARALLEL_THRESHOLD = 300
+
+
+def parallel_depth(workers):
+    """
+    Picks how many levels of the recursion tree to unroll
+    into tasks so that there are at least as many tasks
+    as there are workers to run them.
 
-# global manager and thread-safe container for partial results
-manager = Manager()
-return_dict = manager.dict()
+    :param workers: int
+    :rtype int
+    """
+    return max(1, math.ceil(math.log(workers, 3))) if workers > 1 else 1
 
 
-def multiply_karatsuba_parallel(x, y, key=None):
+def multiply_karatsuba_parallel(x,
+                                y,
+                                depth=None,
+                                workers=None,
+                                threshold=1,
+                                base=multiply_simple):
     """
     Multiplies two numbers represented as arrays
     using the Karatsuba algorithm, falling back
-    on grade school algorithm for the base case
+    on grade school algorithm for the base case.
+    The top `depth` levels of the recursion are
+    run in parallel on a pool of `workers` processes,
+    or serially if there are fewer than two workers.
+    `threshold` and `base` pick the base case for the
+    workers, as for multiply_karatsuba.
+
+    :param x: []int|LimbNumber
+    :param y: []int|LimbNumber
+    :param depth: int
+    :param workers: int
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype []int|LimbNumber
+    """
+    if workers is None:
+        workers = default_workers()
+    # with a single worker, the pool can only add overhead
+    if workers < 2:
+        return multiply_karatsuba(x, y, threshold, base)
+    if depth is None:
+        depth = parallel_depth(workers)
+
+    leaves = []
+    if isinstance(x, LimbNumber):
+        tree = _schedule_limbs(x, y, depth, leaves)
+    else:
+        tree = _schedule(x, y, depth, leaves)
+    # a single leaf would just be sent to one worker, so do it here
+    if not isinstance(tree, tuple):
+        return multiply_karatsuba(x, y, threshold, base)
+
+    pool = get_pool(workers)
+    if isinstance(x, LimbNumber):
+        # limbs are already compact, so they are just sent as they are
+        futures = [
+            pool.submit(_run_timed, multiply_karatsuba_limbs, a, c)
+            for a, c in leaves
+        ]
+        results = [_collect(future) for future in futures]
+    else:
+        results = _multiply_shared_leaves(leaves, pool, threshold, base)
+    return _resolve(tree, results)
+
+
+def _schedule(x, y, depth, leaves):
+    """
+    Unrolls the top `depth` levels of the Karatsuba
+    recursion, appending each leaf sub-product to
+    `leaves`. Returns a tree whose internal nodes are
+    (length, node_1, node_2, node_3) tuples and whose
+    leaves are indexes into `leaves`.
 
     :param x: []int
     :param y: []int
-    :rtype []int
+    :param depth: int
+    :param leaves: [([]int, []int)]
+    :rtype tuple|int
     """
     x, y = match_padding(x, y)
+
+    # for small numbers or once we are deep enough, hand
+    # the whole sub-product to a worker
+    if depth == 0 or len(x) <= PARALLEL_THRESHOLD:
+        leaves.append((x, y))
+        return len(leaves) - 1
+
     a, b = split(x)
     c, d = split(y)
+    return (
+        len(b),
+        _schedule(a, c, depth - 1, leaves),
+        _schedule(b, d, depth - 1, leaves),
+        _schedule(add(a, b), add(c, d), depth - 1, leaves),
+    )
+
+
+def _schedule_limbs(x, y, depth, leaves):
+    """
+    The same as `_schedule`, but for numbers represented
+    as limbs.
+
+    :param x: LimbNumber
+    :param y: LimbNumber
+    :param depth: int
+    :param leaves: [(LimbNumber, LimbNumber)]
+    :rtype tuple|int
+    """
+    length = max(len(x), len(y))
+    if depth == 0 or length * x.digits_per_limb <= PARALLEL_THRESHOLD:
+        leaves.append((x, y))
+        return len(leaves) - 1
+
+    shift = length - length // 2
+    a, b = split_limbs(x, shift)
+    c, d = split_limbs(y, shift)
+    return (
+        shift,
+        _schedule_limbs(a, c, depth - 1, leaves),
+        _schedule_limbs(b, d, depth - 1, leaves),
+        _schedule_limbs(add_limbs(a, b), add_limbs(c, d), depth - 1, leaves),
+    )
+
+
+def _multiply_shared_leaves(leaves, pool, threshold, base):
+    """
+    Multiplies every leaf sub-product on the pool, passing
+    the digits through shared memory rather than pickling
+    them. All the operands are written, one byte per digit,
+    into a single input segment, and each worker writes its
+    product into the matching region of an output segment.
+    A product has at most as many digits as its two operands
+    put together, so the two segments have the same layout.
+    Only the segment names and offsets cross between processes.
+
+    :param leaves: [([]int, []int)]
+    :param pool: ProcessPoolExecutor
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype [][]int
+    """
+    from multiprocessing.shared_memory import SharedMemory
+    size = max(1, sum(len(x) + len(y) for x, y in leaves))
+    inputs = SharedMemory(create=True, size=size)
+    outputs = SharedMemory(create=True, size=size)
+    try:
+        futures = []
+        offset = 0
+        for x, y in leaves:
+            inputs.buf[offset:offset + len(x)] = bytes(x)
+            inputs.buf[offset + len(x):offset + len(x) + len(y)] = bytes(y)
+            futures.append(
+                pool.submit(_run_timed, _multiply_shared, inputs.name,
+                            outputs.name, offset, len(x), len(y), threshold,
+                            base))
+            offset += len(x) + len(y)
+
+        results = []
+        for future in futures:
+            start, length = _collect(future)
+            results.append(list(outputs.buf[start:start + length]))
+        return results
+    finally:
+        inputs.close()
+        inputs.unlink()
+        outputs.close()
+        outputs.unlink()
 
-    # for base case, go simple
-    if len(x) == 1:
-        return multiply_simple(x, y)
-
-    # for big numbers, go parallel
-    if len(x) > 300:
-        # generate random ids for the subprocess outputs
-        r1 = random.random()
-        r2 = random.random()
-        r3 = random.random()
-
-        # run the sub-multiplications in parallel
-        p1 = Process(target=multiply_karatsuba_parallel, args=[a, c, r1])
-        p2 = Process(target=multiply_karatsuba_parallel, args=[b, d, r2])
-        p3 = Process(
-            target=multiply_karatsuba_parallel,
-            args=[add(a, b), add(c, d), r3])
-
-        p1.start()
-        p2.start()
-        p3.start()
-        p1.join()
-        p2.join()
-        p3.join()
-
-        # get the results
-        res_1 = return_dict[r1]
-        res_2 = return_dict[r2]
-        partial = return_dict[r3]
-
-    # for smaller numbers, don't bother parallelizing
-    else:
-        res_1 = multiply_karatsuba_parallel(a, c)
-        res_2 = multiply_karatsuba_parallel(b, d)
-        partial = multiply_karatsuba_parallel(add(a, b), add(c, d))
+
+def _multiply_shared(input_name, output_name, offset, x_length, y_length,
+                     threshold, base):
+    """
+    Runs in a worker: reads a pair of operands from the
+    shared input segment, multiplies them, and writes the
+    product into the shared output segment at the same
+    offset. Returns where the product was written.
+
+    :param input_name: str
+    :param output_name: str
+    :param offset: int
+    :param x_length: int
+    :param y_length: int
+    :param threshold: int
+    :param base: func([]int, []int) []int
+    :rtype int int
+    """
+    from multiprocessing.shared_memory import SharedMemory
+    inputs = SharedMemory(name=input_name)
+    outputs = SharedMemory(name=output_name)
+    try:
+        x = list(inputs.buf[offset:offset + x_length])
+        y = list(inputs.buf[offset + x_length:offset + x_length + y_length])
+        res = strip_leading_zeros(multiply_karatsuba(x, y, threshold, base))
+        outputs.buf[offset:offset + len(res)] = bytes(res)
+    finally:
+        inputs.close()
+        outputs.close()
+    return offset, len(res)
+
+
+def _run_timed(func, *args):
+    """
+    Runs in a worker: calls func, and also returns
+    which worker ran it and how long it took.
+
+    :param func: func
+    :param args: *
+    :rtype (*, int, float)
+    """
+    start = time.perf_counter()
+    res = func(*args)
+    return res, os.getpid(), time.perf_counter() - start
+
+
+def _collect(future):
+    """
+    Waits for a task submitted with `_run_timed`,
+    reports its timing and returns its result.
+
+    :param future: Future
+    :rtype *
+    """
+    res, pid, elapsed = future.result()
+    _record_worker(pid, elapsed)
+    return res
+
+
+def _record_worker(pid, elapsed):
+    """
+    Called with the timing of every task a worker runs.
+    Does nothing; instrument.Profiler replaces it while
+    it is profiling.
+
+    :param pid: int
+    :param elapsed: float, in seconds
+    """
+
+
+def _resolve(node, results):
+    """
+    Combines the leaf sub-products back up a tree
+    built by `_schedule` or `_schedule_limbs`.
+
+    :param node: tuple|int
+    :param results: [][]int|[]LimbNumber
+    :rtype []int|LimbNumber
+    """
+    if not isinstance(node, tuple):
+        return results[node]
+
+    shift, node_1, node_2, node_3 = node
+    res_1 = _resolve(node_1, results)
+    res_2 = _resolve(node_2, results)
+    partial = _resolve(node_3, results)
+
+    if isinstance(partial, LimbNumber):
+        res_3 = subtract_limbs(partial, add_limbs(res_1, res_2))
+        return add_limbs(
+            shift_limbs(res_1, 2 * shift), res_2, shift_limbs(res_3, shift))
 
     # do the karatsuba shuffle
     res_3 = subtract(partial, add(res_1, res_2))
-    res = add(
-        pad(res_1, len(x), 'right'), res_2,
-        pad(res_3, (len(x) + 1) // 2, 'right'))
+    return add(
+        pad(res_1, 2 * shift, 'right'), res_2,
+        pad(res_3, shift, 'right'))
 
-    # if we are in parallel mode, write the result to the global dict
-    if key is not None:
-        return_dict[key] = res
 
-    return res
+# the same algorithm, taking and returning Python ints
+multiply_karatsuba_parallel_int = int_adapter(multiply_karatsuba_parallel)
 
 
 if __name__ == '__main__':
+    from big_numbers import big_number_as_array
 
+    print('testing karatsuba parallel')
     assert multiply_karatsuba_parallel([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
-    print(
-        multiply_karatsuba_parallel(big_number_as_array, big_number_as_array))
+    expected = multiply_karatsuba(big_number_as_array, big_number_as_array)
     assert multiply_karatsuba_parallel(big_number_as_array,
-                                       big_number_as_array) == big_res
+                                       big_number_as_array) == expected
+    assert multiply_karatsuba_parallel(
+        big_number_as_array, big_number_as_array, depth=2,
+        workers=2) == expected
+    limb_number = LimbNumber.from_digits(big_number_as_array)
+    assert multiply_karatsuba_parallel(
+        limb_number, limb_number).to_digits() == expected
+    assert multiply_karatsuba_parallel(limb_number, limb_number,
+                                       workers=2).to_digits() == expected
+    # a single leaf is multiplied here, without starting a pool
+    import pool
+    assert multiply_karatsuba_parallel([2, 4, 5], [6, 7],
+                                       workers=5) == [1, 6, 4, 1, 5]
+    assert 5 not in pool._pools
 
     import time
+    # the pool is already warm from the checks above
     start = time.time()
     multiply_karatsuba_parallel(big_number_as_array, big_number_as_array)
     end = time.time()
-    print('karatsuba', (end - start) * 1000, 'milliseconds')
+    print('karatsuba parallel', (end - start) * 1000, 'milliseconds')
     start = time.time()
-    big_number * big_number
+    multiply_karatsuba(big_number_as_array, big_number_as_array)
     end = time.time()
-    print('native', (end - start) * 1000, 'milliseconds')
+    print('karatsuba', (end - start) * 1000, 'milliseconds')
@@ -0,0 +1,86 @@
+"""
+This module manages the long-lived pools of worker
+processes that the parallel multiplication algorithms
+submit their sub-products to. Creating a pool once
+and reusing it means that we only pay the cost of
+starting processes the first time, not at every level
+of the recursion.
+
+There is one pool per number of workers asked for.
+A pool is never replaced while the process is running,
+since something, such as a multiply_many generator,
+may still be submitting to it. They are all shut down
+when the interpreter exits.
+
+Nothing is started, or even imported, until a pool
+is first asked for, so importing the algorithms costs
+nothing if they are only ever run serially.
+"""
+
+import atexit
+import os
+import threading
+
+# the shared pools by number of workers, and the
+# process they were created in
+_pools = {}
+_pools_pid = None
+_lock = threading.Lock()
+
+
+def default_workers():
+    """
+    The number of workers to use when the caller
+    doesn't ask for a specific number: one per core.
+
+    :rtype int
+    """
+    return os.cpu_count() or 1
+
+
+def get_pool(workers=None):
+    """
+    Returns the shared pool with `workers` worker
+    processes, creating it on first use.
+
+    A forked worker inherits a copy of its parent's pools,
+    which it can't use: submitting to them would deadlock.
+    So asking for a pool from inside a worker raises
+    RuntimeError; code that runs in workers must multiply
+    serially instead.
+
+    :param workers: int
+    :rtype ProcessPoolExecutor
+    """
+    global _pools_pid
+    if workers is None:
+        workers = default_workers()
+    with _lock:
+        if _pools and _pools_pid != os.getpid():
+            raise RuntimeError(
+                'the worker pool can only be used by the process that '
+                'created it')
+        if workers not in _pools:
+            from concurrent.futures import ProcessPoolExecutor
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+            _pools_pid = os.getpid()
+        return _pools[workers]
+
+
+def shutdown_pool():
+    """
+    Shuts down all of the shared worker pools, waiting
+    for any outstanding work to finish. Only call this
+    once nothing is using the pools any more.
+    """
+    global _pools_pid
+    with _lock:
+        # copies inherited from a parent process are the parent's to close
+        if _pools_pid == os.getpid():
+            for pool in _pools.values():
+                pool.shutdown(wait=True)
+        _pools.clear()
+        _pools_pid = None
+
+
+atexit.register(shutdown_pool)
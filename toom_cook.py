@@ -0,0 +1,169 @@
+"""
+This module implements integer multiplication
+using a recursive implementation of the Toom-3
+(Toom-Cook) algorithm, falling back to the Karatsuba
+algorithm below a threshold. Each number is split
+into three parts, which are treated as the
+coefficients of a polynomial. The polynomials are
+evaluated at five points, the five values multiplied
+recursively, and the product polynomial recovered by
+interpolation. The algorithm has O(n^1.46) time
+complexity and O(n) space complexity.
+
+Evaluating at negative points means intermediate
+values can go negative, so they are represented as
+signed numbers from util.
+"""
+
+from util import add, add_signed, divide_small, match_padding, pad, signed, strip_leading_zeros, subtract_signed
+from karatsuba import multiply_karatsuba
+
+# below this many digits, fall back to Karatsuba
+TOOM_THRESHOLD = 100
+
+
+def multiply_toom_3(x, y, threshold=TOOM_THRESHOLD):
+    """
+    Multiplies two numbers represented as arrays
+    using the Toom-3 algorithm, falling back on
+    the Karatsuba algorithm for numbers of no more
+    than `threshold` digits.
+
+    :param x: []int
+    :param y: []int
+    :param threshold: int
+    :rtype []int
+    """
+    x, y = match_padding(x, y)
+    if len(x) <= threshold:
+        return strip_leading_zeros(multiply_karatsuba(x, y))
+
+    # split each number into three parts of k digits,
+    # so that x = x2 * 10^2k + x1 * 10^k + x0
+    k = (len(x) + 2) // 3
+    x2, x1, x0 = _split_3(x, k)
+    y2, y1, y0 = _split_3(y, k)
+
+    # evaluate at 0, 1, -1, -2 and infinity, and
+    # multiply the values pointwise
+    r_0 = _multiply_signed(signed(x0), signed(y0), threshold)
+    r_1 = _multiply_signed(_evaluate(x2, x1, x0, 1), _evaluate(y2, y1, y0, 1),
+                           threshold)
+    r_minus_1 = _multiply_signed(_evaluate(x2, x1, x0, -1),
+                                 _evaluate(y2, y1, y0, -1), threshold)
+    r_minus_2 = _multiply_signed(_evaluate(x2, x1, x0, -2),
+                                 _evaluate(y2, y1, y0, -2), threshold)
+    r_inf = _multiply_signed(signed(x2), signed(y2), threshold)
+
+    # interpolate to get back the coefficients of the product
+    # (this is Bodrato's sequence for these evaluation points)
+    c_3 = _divide_signed(subtract_signed(r_minus_2, r_1), 3)
+    c_1 = _divide_signed(subtract_signed(r_1, r_minus_1), 2)
+    c_2 = subtract_signed(r_minus_1, r_0)
+    c_3 = add_signed(
+        _divide_signed(subtract_signed(c_2, c_3), 2), add_signed(r_inf, r_inf))
+    c_2 = subtract_signed(add_signed(c_2, c_1), r_inf)
+    c_1 = subtract_signed(c_1, c_3)
+
+    # the coefficients of a product of non-negative
+    # numbers are never negative, so drop the signs
+    # and shift them into place
+    res = add(
+        pad(r_inf.digits, 4 * k, 'right'), pad(c_3.digits, 3 * k, 'right'),
+        pad(c_2.digits, 2 * k, 'right'), pad(c_1.digits, k, 'right'),
+        r_0.digits)
+    return strip_leading_zeros(res)
+
+
+def _split_3(num, k):
+    """
+    Splits a number into three parts of k digits each,
+    most significant first, padding with leading zeros.
+
+    :param num: []int
+    :param k: int
+    :rtype []int []int []int
+    """
+    num = pad(num, 3 * k - len(num))
+    return num[:k], num[k:2 * k], num[2 * k:]
+
+
+def _evaluate(c_2, c_1, c_0, point):
+    """
+    Evaluates c_2 * point^2 + c_1 * point + c_0
+    for a small int point.
+
+    :param c_2: []int
+    :param c_1: []int
+    :param c_0: []int
+    :param point: int
+    :rtype SignedNumber
+    """
+    res = signed(c_0)
+    term_1 = signed(c_1)
+    term_2 = signed(c_2)
+    for _ in range(abs(point)):
+        res = add_signed(res, term_1) if point > 0 else subtract_signed(
+            res, term_1)
+    for _ in range(point * point):
+        res = add_signed(res, term_2)
+    return res
+
+
+def _divide_signed(x, divisor):
+    """
+    Exactly divides a signed number by a small positive int.
+
+    :param x: SignedNumber
+    :param divisor: int
+    :rtype SignedNumber
+    """
+    return signed(divide_small(x.digits, divisor), x.sign)
+
+
+def _multiply_signed(x, y, threshold):
+    """
+    Multiplies two signed numbers, recursing
+    into Toom-3 for the magnitudes.
+
+    :param x: SignedNumber
+    :param y: SignedNumber
+    :param threshold: int
+    :rtype SignedNumber
+    """
+    return signed(multiply_toom_3(x.digits, y.digits, threshold),
+                  x.sign * y.sign)
+
+
+if __name__ == '__main__':
+    import random
+    from big_numbers import big_number_as_array
+
+    print('testing toom-3')
+    assert multiply_toom_3([0], [0]) == [0]
+    assert multiply_toom_3([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_toom_3([2, 4, 5], [6, 7], threshold=1) == [1, 6, 4, 1, 5]
+    assert multiply_toom_3([9, 9, 9, 9], [9, 9, 9, 9], threshold=1) == [
+        9, 9, 9, 8, 0, 0, 0, 1]
+    for length in [3, 7, 50, 301]:
+        x = [random.randint(0, 9) for _ in range(length)]
+        y = [random.randint(0, 9) for _ in range(length)]
+        assert multiply_toom_3(x, y, threshold=2) == strip_leading_zeros(
+            multiply_karatsuba(x, y))
+    assert multiply_toom_3(big_number_as_array,
+                           big_number_as_array) == strip_leading_zeros(
+                               multiply_karatsuba(big_number_as_array,
+                                                  big_number_as_array))
+
+    # find where toom-3 overtakes karatsuba
+    import time
+    for length in [100, 300, 900, 1800, 3600]:
+        x = [random.randint(1, 9) for _ in range(length)]
+        start = time.time()
+        multiply_karatsuba(x, x)
+        end = time.time()
+        print(length, 'digits karatsuba', (end - start) * 1000, 'milliseconds')
+        start = time.time()
+        multiply_toom_3(x, x)
+        end = time.time()
+        print(length, 'digits toom-3', (end - start) * 1000, 'milliseconds')
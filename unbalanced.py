@@ -0,0 +1,102 @@
+"""
+This module implements multiplication of numbers
+with very different lengths. Padding the short
+number up to the length of the long one, as
+match_padding does, means a 50 by 200000 digit
+product is done as a 200000 by 200000 digit one,
+mostly multiplying zeros.
+
+Instead, the long number is cut into chunks the
+length of the short one, each chunk is multiplied
+by the short number with a balanced algorithm, and
+the products are added back together, shifted into
+place. With m digits in the short number and n in
+the long one, that's n / m balanced products, which
+for Karatsuba costs O(n * m^0.58) rather than
+O(n^1.58). The chunks are independent, so they can
+also be multiplied in parallel.
+"""
+
+import itertools
+
+from util import strip_leading_zeros
+from karatsuba import multiply_karatsuba
+from pool import get_pool
+
+# only split up the long number if it is at least this many times longer
+UNBALANCED_RATIO = 2
+
+
+def multiply_unbalanced(x, y, engine=multiply_karatsuba, workers=None):
+    """
+    Multiplies two numbers represented as arrays by
+    cutting the longer one into chunks the length of
+    the shorter one and multiplying each chunk using
+    `engine`. If `workers` is more than one, the chunks
+    are multiplied in parallel on the worker pool.
+
+    :param x: []int
+    :param y: []int
+    :param engine: func([]int, []int) []int
+    :param workers: int
+    :rtype []int
+    """
+    x = strip_leading_zeros(x)
+    y = strip_leading_zeros(y)
+    short, long = (x, y) if len(x) <= len(y) else (y, x)
+    size = len(short)
+
+    # cut from the right, so every chunk but the leftmost is full size
+    chunks = [long[max(0, end - size):end]
+              for end in range(len(long), 0, -size)]
+
+    if workers is not None and workers > 1 and len(chunks) > 1:
+        pool = get_pool(workers)
+        products = pool.map(engine, chunks, itertools.repeat(short),
+                            chunksize=max(1, len(chunks) // (4 * workers)))
+    else:
+        products = (engine(chunk, short) for chunk in chunks)
+
+    # accumulate the products least significant digit first and
+    # without carrying; each slot is covered by at most two products
+    res = [0] * (len(long) + size + 1)
+    for i, product in enumerate(products):
+        offset = i * size
+        for j, digit in enumerate(reversed(strip_leading_zeros(product))):
+            res[offset + j] += digit
+
+    carry = 0
+    for i in range(len(res)):
+        carry, res[i] = divmod(res[i] + carry, 10)
+    res.reverse()
+    return strip_leading_zeros(res)
+
+
+if __name__ == '__main__':
+    import random
+    from big_numbers import big_number_as_array
+
+    print('testing multiply_unbalanced')
+    assert multiply_unbalanced([0], [0]) == [0]
+    assert multiply_unbalanced([2, 4, 5], [6, 7]) == [1, 6, 4, 1, 5]
+    assert multiply_unbalanced([6, 7], [2, 4, 5]) == [1, 6, 4, 1, 5]
+    assert multiply_unbalanced([9, 9], [9] * 7) == [9, 8] + [9] * 5 + [0, 1]
+    assert multiply_unbalanced([0, 0, 3], [1, 0, 0, 0, 0, 0]) == [3, 0, 0, 0,
+                                                                   0, 0]
+    for length in [1, 7, 50]:
+        short = [random.randint(0, 9) for _ in range(length)]
+        long = [random.randint(0, 9) for _ in range(length * 13 + 5)]
+        expected = strip_leading_zeros(multiply_karatsuba(short, long))
+        assert multiply_unbalanced(short, long) == expected
+        assert multiply_unbalanced(long, short, workers=2) == expected
+
+    import time
+    short = big_number_as_array[:50]
+    start = time.time()
+    multiply_unbalanced(short, big_number_as_array)
+    end = time.time()
+    print('unbalanced', (end - start) * 1000, 'milliseconds')
+    start = time.time()
+    multiply_karatsuba(short, big_number_as_array)
+    end = time.time()
+    print('karatsuba', (end - start) * 1000, 'milliseconds')
@@ -1,3 +1,9 @@
+from collections import namedtuple
+
+# a signed number: sign is 1 or -1, and digits is the magnitude as an array
+SignedNumber = namedtuple('SignedNumber', ['sign', 'digits'])
+
+
 def add(*args):
     """
     Adds an arbitrary number of numbers represented 
@@ -18,6 +24,23 @@ def add(*args):
     return res
 
 
+def add_signed(x, y):
+    """
+    Adds two signed numbers, by adding the magnitudes if
+    the signs match and otherwise subtracting the smaller
+    magnitude from the larger.
+
+    :param x: SignedNumber
+    :param y: SignedNumber
+    :rtype SignedNumber
+    """
+    if x.sign == y.sign:
+        return signed(add(x.digits, y.digits), x.sign)
+    if compare(x.digits, y.digits) >= 0:
+        return signed(subtract(x.digits, y.digits), x.sign)
+    return signed(subtract(y.digits, x.digits), y.sign)
+
+
 def carry_left(num, cardinality):
     """
     Carries an overflowing digit to the left,
@@ -35,20 +58,70 @@ def carry_left(num, cardinality):
         # first, need to make sure there is a slot to the left;
         # if not, create it by adding more left padding
         num = pad_if_needed(num, cardinality)
-        # now, grab the next slot to the left and
-        # start dumping tens into it
-        digit -= 10
+        # now, keep the remainder in this slot and dump
+        # all of the tens into the next slot to the left
+        carry, digit = divmod(digit, 10)
         num[len(num) - (cardinality + 1)] = digit
-        num[len(num) - (cardinality + 2)] += 1
-        # if we got below 10, move one place to the left
-        # and carry on (see what I did there?)
-        if digit < 10:
-            cardinality += 1
-            digit = num[len(num) - (cardinality + 1)]
+        num[len(num) - (cardinality + 2)] += carry
+        # move one place to the left and carry on
+        # (see what I did there?)
+        cardinality += 1
+        digit = num[len(num) - (cardinality + 1)]
 
     return num
 
 
+def compare(x, y):
+    """
+    Compares two numbers represented as arrays,
+    returning -1 if x < y, 0 if x == y and 1 if x > y.
+
+    :param x: []int
+    :param y: []int
+    :rtype int
+    """
+    x, y = match_padding(x, y)
+    # the first digit that differs from the left decides it
+    for a, b in zip(x, y):
+        if a != b:
+            return -1 if a < b else 1
+    return 0
+
+
+def compare_signed(x, y):
+    """
+    Compares two signed numbers, returning -1 if
+    x < y, 0 if x == y and 1 if x > y.
+
+    :param x: SignedNumber
+    :param y: SignedNumber
+    :rtype int
+    """
+    if x.sign != y.sign:
+        return x.sign
+    return x.sign * compare(x.digits, y.digits)
+
+
+def divide_small(num, divisor):
+    """
+    Divides a number represented as an array by a small
+    positive int using long division, from left to right.
+    The division must be exact - the remainder is not
+    returned, so we check that there isn't one.
+
+    :param num: []int
+    :param divisor: int
+    :rtype []int
+    """
+    res = [0] * len(num)
+    remainder = 0
+    for i in range(len(num)):
+        res[i], remainder = divmod(remainder * 10 + num[i], divisor)
+    if remainder != 0:
+        raise ValueError('{} does not divide exactly'.format(divisor))
+    return strip_leading_zeros(res)
+
+
 def match_padding(*args):
     """
     Pads numbers with leading zeros until 
@@ -64,6 +137,16 @@ def match_padding(*args):
     return [pad(num, max_length - len(num)) for num in args]
 
 
+def negate(x):
+    """
+    Flips the sign of a signed number, leaving zero positive.
+
+    :param x: SignedNumber
+    :rtype SignedNumber
+    """
+    return signed(x.digits, -x.sign)
+
+
 def pad(num, padding, side='left'):
     """
     Pads a number expressed as an array with leading zeros
@@ -73,7 +156,7 @@ def pad(num, padding, side='left'):
     :rtype []int
     """
     return [*num,
-            *([0] * padding)] if side is 'right' else [*([0] * padding), *num]
+            *([0] * padding)] if side == 'right' else [*([0] * padding), *num]
 
 
 def pad_if_needed(num, cardinality):
@@ -89,6 +172,20 @@ def pad_if_needed(num, cardinality):
     return num
 
 
+def signed(num, sign=1):
+    """
+    Builds a signed number from a magnitude represented
+    as an array. Zero always gets a positive sign, so
+    that there is only one way to write it.
+
+    :param num: []int
+    :param sign: int
+    :rtype SignedNumber
+    """
+    num = strip_leading_zeros(num)
+    return SignedNumber(1 if num == [0] else sign, num)
+
+
 def split(num):
     """
     Given a number expressed as an array of digits, split
@@ -133,24 +230,38 @@ def subtract(x, y):
     """
     x, y = match_padding(x, y)
     res = [0] * len(x)
-    # go from left to right, subtracting
+    # go from right to left, subtracting
     # pairwise
-    for i in range(len(x)):
-        sub = x[i] - y[i]
-        # if we went negative, 'carry' the
-        # negative ten to the left and leave
+    borrow = 0
+    for i in range(len(x) - 1, -1, -1):
+        sub = x[i] - y[i] - borrow
+        # if we went negative, borrow ten
+        # from the slot to the left and leave
         # the remainder in this slot
         if sub < 0:
             res[i] = 10 + sub
-            res[i - 1] -= 1
+            borrow = 1
         # otherwise, just put the result of
         # the pairwise subtraction in the
         # current slot
         else:
             res[i] = sub
+            borrow = 0
     return strip_leading_zeros(res)
 
 
+def subtract_signed(x, y):
+    """
+    Subtracts a signed number y from a signed number x.
+    Unlike subtract, the result can be negative.
+
+    :param x: SignedNumber
+    :param y: SignedNumber
+    :rtype SignedNumber
+    """
+    return add_signed(x, negate(y))
+
+
 if __name__ == '__main__':
 
     print('testing add')
@@ -164,6 +275,31 @@ if __name__ == '__main__':
     assert add([2, 4, 5], [0, 6, 7], [0, 0, 5]) == [3, 1, 7]
     assert add([6, 0, 0], [0], [0, 0]) == [6, 0, 0]
 
+    print('testing add_signed and subtract_signed')
+    assert add_signed(signed([5]), signed([3], -1)) == (1, [2])
+    assert add_signed(signed([3]), signed([5], -1)) == (-1, [2])
+    assert add_signed(signed([3], -1), signed([5], -1)) == (-1, [8])
+    assert add_signed(signed([5]), signed([5], -1)) == (1, [0])
+    assert subtract_signed(signed([1, 2]), signed([9, 9])) == (-1, [8, 7])
+    assert subtract_signed(signed([1, 2]), signed([9], -1)) == (1, [2, 1])
+
+    print('testing compare_signed')
+    assert compare_signed(signed([1]), signed([2], -1)) == 1
+    assert compare_signed(signed([1], -1), signed([2], -1)) == 1
+    assert compare_signed(signed([0], -1), signed([0])) == 0
+    assert compare_signed(signed([1, 0], -1), signed([2])) == -1
+
+    print('testing compare')
+    assert compare([0], [0]) == 0
+    assert compare([1, 2], [0, 1, 2]) == 0
+    assert compare([1, 2], [2, 1]) == -1
+    assert compare([1, 0, 0], [9, 9]) == 1
+
+    print('testing divide_small')
+    assert divide_small([0], 3) == [0]
+    assert divide_small([1, 2, 3], 3) == [4, 1]
+    assert divide_small([1, 0, 0, 0], 8) == [1, 2, 5]
+
     print('testing match_padding')
     assert match_padding([6, 0, 0], [0], [0, 0]) == [[6, 0, 0], [0, 0, 0],
                                                      [0, 0, 0]]
@@ -174,6 +310,7 @@ if __name__ == '__main__':
     assert carry_left([0, 20], 0) == [2, 0]
     assert carry_left([0, 24], 0) == [2, 4]
     assert carry_left([11, 9], 1) == [1, 1, 9]
+    assert carry_left([9, 9, 162], 0) == [1, 1, 5, 2]
 
     print('testing pad')
     assert pad([1], 0) == [1]
@@ -191,3 +328,4 @@ if __name__ == '__main__':
     assert subtract([8, 4], [3, 5]) == [4, 9]
     assert subtract([2, 4, 5], [0, 6, 7]) == [1, 7, 8]
     assert subtract([1, 1, 7], [5, 9]) == [5, 8]
+    assert subtract([1, 0, 0], [0, 0, 1]) == [9, 9]